@@ -0,0 +1,67 @@
+import os
+import hashlib
+import threading
+from pathlib import Path
+import chromadb
+from chromadb.config import Settings
+
+# One PersistentClient per persist directory for the whole process. Every VectorEngine
+# and retriever shares it instead of opening the SQLite store again per file/request.
+_clients = {}
+_write_locks = {}
+_collection_locks = {}
+_pool_lock = threading.Lock()
+
+
+def _key(persist_directory):
+    return str(Path(persist_directory).resolve())
+
+
+def memory_budget_bytes():
+    """CASE_MEMORY_BUDGET_MB: memory for loaded case indexes (0 = unlimited)."""
+    return int(float(os.getenv("CASE_MEMORY_BUDGET_MB", "0")) * 1024 * 1024)
+
+
+def client_settings():
+    budget = memory_budget_bytes()
+    if not budget:
+        return Settings()
+    # Chroma keeps loaded collection segments in an LRU cache capped at the budget,
+    # so a cold case's vector index is unloaded instead of staying resident
+    return Settings(chroma_segment_cache_policy="LRU", chroma_memory_limit_bytes=budget)
+
+
+def get_client(persist_directory):
+    key = _key(persist_directory)
+    with _pool_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = chromadb.PersistentClient(path=key, settings=client_settings())
+            _clients[key] = client
+        return client
+
+
+def get_write_lock(persist_directory):
+    """Serializes writes to one persist directory (Chroma's SQLite allows a single writer)."""
+    key = _key(persist_directory)
+    with _pool_lock:
+        return _write_locks.setdefault(key, threading.Lock())
+
+
+def get_collection_lock(persist_directory, collection_name):
+    """Held across read-modify-write sequences on one collection (e.g. chunk dedup)."""
+    key = (_key(persist_directory), collection_name)
+    with _pool_lock:
+        return _collection_locks.setdefault(key, threading.Lock())
+
+
+def chunk_id(case_id, source_file, text, parent_id=None):
+    """
+    Deterministic chunk ID: re-ingesting the same file upserts instead of duplicating.
+    Hierarchical children include their parent, so a footer repeated in every parent
+    window is one child per parent, not a single child pointing at the last parent.
+    """
+    text_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    if parent_id:
+        return hashlib.sha1(f"{case_id}|{source_file}|{parent_id}|{text_hash}".encode("utf-8")).hexdigest()
+    return hashlib.sha1(f"{case_id}|{source_file}|{text_hash}".encode("utf-8")).hexdigest()
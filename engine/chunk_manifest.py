@@ -0,0 +1,119 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Bump when chunking code changes in a way the config alone doesn't capture
+CHUNKER_VERSION = 1
+
+
+def chunking_fingerprint(chunker):
+    """Short hash of everything that decides chunk boundaries for a RAGChunker."""
+    config = {
+        "version": CHUNKER_VERSION,
+        "chunk_size": chunker.chunk_size,
+        "chunk_overlap": chunker.chunk_overlap,
+        "streaming": chunker.streaming,
+        "structured": chunker.structured,
+        "hierarchical": chunker.hierarchical,
+        "parent_size": chunker.parent_size if chunker.hierarchical else None,
+        "semantic": bool(chunker.semantic_chunker),
+        "max_tokens": chunker.token_chunker.max_tokens if chunker.token_chunker else None,
+        "media_window_seconds": chunker.media_chunker.window_seconds if chunker.media_chunker else None,
+    }
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16], config
+
+
+class ChunkManifest:
+    """
+    Per-case record of how every indexed document was chunked.
+
+    For each source_file: the chunking fingerprint + config, the parser outputs the chunks
+    came from (markdown / structured JSON) and the provenance metadata. rebuild.py uses it
+    to re-chunk only documents whose fingerprint differs from the current chunker.
+    """
+
+    def __init__(self, case_id, manifest_dir="data/manifests"):
+        self.case_id = case_id
+        self.manifest_path = Path(manifest_dir) / f"{case_id}.json"
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.files = {}
+        self._refresh()
+
+    def _refresh(self):
+        """Reloads the manifest if another process (main2, rebuild.py, the server) rewrote it."""
+        try:
+            mtime = self.manifest_path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.files = json.load(f).get("files", {})
+            self._mtime = mtime
+
+    def _save(self):
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"case_id": self.case_id, "files": self.files}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+        self._mtime = self.manifest_path.stat().st_mtime
+
+    def record(self, source_file, chunker, parsed_results, chunk_count):
+        fingerprint, config = chunking_fingerprint(chunker)
+        with self._lock:
+            self._refresh()
+            self.files[source_file] = {
+                "fingerprint": fingerprint,
+                "config": config,
+                "markdown": parsed_results.get("markdown"),
+                "json": parsed_results.get("json"),
+                "provenance": parsed_results.get("provenance"),
+                "chunk_count": chunk_count,
+                "updated": datetime.utcnow().isoformat(),
+            }
+            self._save()
+
+    def stale(self, chunker):
+        """Source files whose recorded fingerprint differs from `chunker`'s."""
+        fingerprint, _config = chunking_fingerprint(chunker)
+        with self._lock:
+            self._refresh()
+        return [name for name, entry in self.files.items() if entry.get("fingerprint") != fingerprint]
+
+    def names(self):
+        with self._lock:
+            self._refresh()
+            return list(self.files)
+
+    def forget(self, source_file):
+        with self._lock:
+            self._refresh()
+            if self.files.pop(source_file, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self.files = {}
+            self._save()
+
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def get_manifest(case_id):
+    """One shared ChunkManifest per case, so concurrent ingests don't overwrite each other."""
+    with _manifests_lock:
+        if case_id not in _manifests:
+            _manifests[case_id] = ChunkManifest(case_id)
+        return _manifests[case_id]
+
+
+def drop_manifest(case_id):
+    """Forgets a case's ChunkManifest when the case is unloaded (reloaded from disk on next use)."""
+    with _manifests_lock:
+        _manifests.pop(case_id, None)
@@ -0,0 +1,119 @@
+from array import array
+from langchain_core.documents import Document
+
+_MISSING = object()
+
+
+class ChunkRecord:
+    """
+    One chunk read out of a ChunkBatch. Uses the same attribute names as a LangChain
+    Document, so code that only touches page_content/metadata accepts either.
+    """
+
+    __slots__ = ("page_content", "metadata")
+
+    def __init__(self, page_content, metadata):
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+class ChunkBatch:
+    """
+    Columnar batch of chunks instead of one Document + dict per chunk.
+
+    - All texts live in one string, sliced by an `offsets` array.
+    - Metadata equal for every chunk (source_file, provenance, ...) is stored once in `shared`.
+    - Metadata that varies (headers, pages, token_part, ...) lives in `columns`,
+      one list per key with None where a chunk doesn't have it.
+    """
+
+    __slots__ = ("shared", "columns", "offsets", "_text", "_parts")
+
+    def __init__(self, shared=None):
+        self.shared = dict(shared or {})
+        self.columns = {}
+        self.offsets = array("Q", [0])
+        self._text = ""
+        self._parts = []
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield ChunkRecord(self.text(i), self.metadata(i))
+
+    # ==========================================================
+    # BUILDING
+    # ==========================================================
+
+    def append(self, text, metadata=None):
+        index = len(self)
+        self._parts.append(text)
+        self.offsets.append(self.offsets[-1] + len(text))
+        for key, value in (metadata or {}).items():
+            if self.shared.get(key, _MISSING) == value:
+                continue
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [None] * index
+            column.append(value)
+        # Keep every column as long as the batch
+        for column in self.columns.values():
+            if len(column) < index + 1:
+                column.append(None)
+
+    def extend(self, chunks):
+        for chunk in chunks:
+            self.append(chunk.page_content, chunk.metadata)
+        return self
+
+    @classmethod
+    def from_documents(cls, documents, shared=None):
+        """Builds a batch from Documents; `shared` defaults to the metadata common to all of them."""
+        documents = list(documents)
+        if shared is None and documents:
+            shared = dict(documents[0].metadata)
+            for doc in documents[1:]:
+                shared = {k: v for k, v in shared.items() if doc.metadata.get(k, _MISSING) == v}
+        return cls(shared).extend(documents)
+
+    # ==========================================================
+    # READING
+    # ==========================================================
+
+    def _seal(self):
+        if self._parts:
+            self._text += "".join(self._parts)
+            self._parts = []
+        return self._text
+
+    def text(self, i):
+        return self._seal()[self.offsets[i]:self.offsets[i + 1]]
+
+    def metadata(self, i):
+        metadata = dict(self.shared)
+        for key, column in self.columns.items():
+            if column[i] is not None:
+                metadata[key] = column[i]
+        return metadata
+
+    def texts(self):
+        text = self._seal()
+        offsets = self.offsets
+        return [text[offsets[i]:offsets[i + 1]] for i in range(len(self))]
+
+    def metadatas(self):
+        return [self.metadata(i) for i in range(len(self))]
+
+    def to_documents(self):
+        """Shim for LangChain callers (chains, retrievers, splitters)."""
+        return [Document(page_content=text, metadata=meta) for text, meta in zip(self.texts(), self.metadatas())]
+
+    def __getstate__(self):
+        self._seal()
+        return (self.shared, self.columns, self.offsets, self._text)
+
+    def __setstate__(self, state):
+        self.shared, self.columns, self.offsets, self._text = state
+        self._parts = []
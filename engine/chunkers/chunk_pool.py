@@ -0,0 +1,105 @@
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from engine.chunkers.chunk_batch import ChunkBatch
+
+# Same reasoning as the parser pool: don't fork torch/tokenizer threads into workers
+_ctx = mp.get_context("spawn")
+
+# One RAGChunker per worker process, built once by the initializer
+_chunker = None
+
+
+def _init_worker(chunker_kwargs):
+    global _chunker
+    from engine.chunkers.chunker4 import RAGChunker
+
+    _chunker = RAGChunker(**chunker_kwargs)
+
+
+def _chunk_task(name, md_path, json_path, extra_metadata):
+    """
+    Runs in a worker. Reads the parser output from disk (only paths cross the process
+    boundary) and returns the chunks as one columnar ChunkBatch.
+    """
+    if json_path and _chunker.structured:
+        chunks = _chunker.create_chunks_from_docling(json_path, name, extra_metadata=extra_metadata)
+    elif _chunker.streaming:
+        chunks = list(_chunker.iter_file_chunks(md_path, name, extra_metadata=extra_metadata))
+    else:
+        with open(md_path, "r", encoding="utf-8") as f:
+            chunks = _chunker.create_chunks(f.read(), name, extra_metadata=extra_metadata)
+
+    return name, ChunkBatch({"source_file": name, **(extra_metadata or {})}).extend(chunks)
+
+
+class ParallelChunker:
+    """
+    Chunks parsed files across worker processes so the pure-Python splitters don't
+    fight the parsing/indexing threads for the GIL during backfills.
+
+    Each worker holds its own RAGChunker (same settings as the parent's). Semantic mode
+    is not supported here: it needs the embedding model, so keep that in-process.
+    Token statistics are counted in the workers and are not part of chunker.token_report().
+    """
+
+    def __init__(self, num_workers=4, chunk_size=1500, chunk_overlap=200, streaming=False,
+                 max_tokens=None, structured=False):
+        self.num_workers = num_workers
+        chunker_kwargs = {
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+            "streaming": streaming,
+            "max_tokens": max_tokens,
+            "structured": structured,
+        }
+        self.executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=_ctx,
+            initializer=_init_worker,
+            initargs=(chunker_kwargs,)
+        )
+
+    @classmethod
+    def from_chunker(cls, chunker, num_workers=4):
+        """Pool whose workers chunk exactly like an existing RAGChunker."""
+        max_tokens = None
+        if chunker.token_chunker:
+            max_tokens = chunker.token_chunker.max_tokens
+        return cls(
+            num_workers=num_workers,
+            chunk_size=chunker.chunk_size,
+            chunk_overlap=chunker.chunk_overlap,
+            streaming=chunker.streaming,
+            max_tokens=max_tokens,
+            structured=chunker.structured
+        )
+
+    def submit(self, name, md_path, json_path=None, extra_metadata=None):
+        """Future resolving to (name, ChunkBatch) for one file."""
+        return self.executor.submit(
+            _chunk_task, name, str(md_path), str(json_path) if json_path else None, extra_metadata
+        )
+
+    def chunk(self, name, md_path, json_path=None, extra_metadata=None):
+        """Blocking helper: chunks one file in a worker and returns its ChunkBatch."""
+        return self.submit(name, md_path, json_path, extra_metadata).result()[1]
+
+    def iter_chunks(self, items, max_in_flight=None):
+        """
+        Batch API. `items` yields (name, md_path, json_path, extra_metadata) tuples;
+        yields (name, ChunkBatch) in submission order, keeping at most `max_in_flight`
+        files queued so huge backfills don't pile up results in memory.
+        """
+        max_in_flight = max_in_flight or self.num_workers * 4
+        pending = deque()
+        for name, md_path, json_path, extra_metadata in items:
+            pending.append(self.submit(name, Path(md_path), json_path, extra_metadata))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
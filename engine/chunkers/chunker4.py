@@ -3,13 +3,45 @@
 
 import os
 import re
+import hashlib
 from pathlib import Path
 from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
+from engine.chunkers.stream_chunker import StreamingChunker
+from engine.chunkers.chunk_batch import ChunkBatch
 
 class RAGChunker:
-    def __init__(self, chunk_size=1500, chunk_overlap=200): # Increased size slightly
+    def __init__(self, chunk_size=1500, chunk_overlap=200, streaming=False, max_tokens=None,
+                 structured=False, semantic_embeddings=None, hierarchical=False, parent_size=None,
+                 media_window_seconds=None): # Increased size slightly
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # hierarchical=True: chunk_size is the (small) embedded child, parent_size the window sent to the LLM
+        self.hierarchical = hierarchical
+        self.parent_size = parent_size or chunk_size * 4
+
+        # Media mode: audio/video markdown is split on time windows (start_sec/end_sec metadata)
+        self.media_chunker = None
+        if media_window_seconds:
+            from engine.chunkers.media_chunker import MediaChunker
+            self.media_chunker = MediaChunker(window_seconds=media_window_seconds, max_chars=chunk_size)
+        # streaming=True: callers should prefer iter_file_chunks (single pass, bounded memory)
+        self.streaming = streaming
+        # structured=True: callers should prefer create_chunks_from_docling (no markdown round trip)
+        self.structured = structured
+
+        # Semantic mode: boundaries at topic shifts, using the VectorEngine embedding model
+        self.semantic_chunker = None
+        if semantic_embeddings is not None:
+            from engine.chunkers.semantic_chunker import SemanticChunker
+            self.semantic_chunker = SemanticChunker(
+                semantic_embeddings, min_chars=chunk_size // 4, max_chars=chunk_size
+            )
+
+        # Token mode: size chunks with the embedding model's tokenizer (max_tokens=True -> model window)
+        self.token_chunker = None
+        if max_tokens:
+            from engine.chunkers.token_chunker import TokenAwareChunker
+            self.token_chunker = TokenAwareChunker(max_tokens=None if max_tokens is True else max_tokens)
         
         self.headers_to_split_on = [
             ("#", "Header 1"),
@@ -34,7 +66,7 @@ class RAGChunker:
         return text.strip()
 
 
-    def create_chunks(self, md_text, filename):
+    def create_chunks(self, md_text, filename, extra_metadata=None):
 
         clean_text = self._clean_text(md_text)
 
@@ -47,7 +79,15 @@ class RAGChunker:
         )
         header_splits = markdown_splitter.split_text(clean_text)
 
-        if is_image or len(md_text)<2000:
+        if self.semantic_chunker and not is_image:
+            # Semantic mode: cut inside sections where adjacent sentences stop being similar
+            final_chunks = self.semantic_chunker.chunk_sections(header_splits, filename)
+            if self.token_chunker:
+                final_chunks = self.token_chunker.split_documents(final_chunks)
+        elif self.token_chunker:
+            # Token mode: header sections are cut by tokenizer length instead of characters
+            final_chunks = self.token_chunker.split_documents(header_splits)
+        elif is_image or len(md_text)<2000:
             final_chunks = header_splits
         else:
         # 2. Refined Recursive Splitter
@@ -63,4 +103,138 @@ class RAGChunker:
         # 3. Inject Metadata (CRITICAL for your filtering)
         for chunk in final_chunks:
             chunk.metadata["source_file"] = filename
-        return final_chunks
\ No newline at end of file
+            # Provenance for files expanded from archives/mailboxes (parent_file, container_path)
+            if extra_metadata:
+                chunk.metadata.update(extra_metadata)
+        return final_chunks
+
+    def _shared_metadata(self, filename, extra_metadata):
+        return {"source_file": filename, **(extra_metadata or {})}
+
+    def create_chunk_batch(self, md_text, filename, extra_metadata=None):
+        """create_chunks packed into a columnar ChunkBatch (what VectorEngine consumes)."""
+        batch = ChunkBatch(self._shared_metadata(filename, extra_metadata))
+        is_image = filename.lower().endswith(('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tiff'))
+        if self.token_chunker or (self.semantic_chunker and not is_image):
+            return batch.extend(self.create_chunks(md_text, filename, extra_metadata))
+
+        # Plain mode: split each header section's text and append it, no Document per chunk
+        markdown_splitter = MarkdownHeaderTextSplitter(
+            headers_to_split_on=self.headers_to_split_on,
+            strip_headers=False
+        )
+        text_splitter = None
+        if not (is_image or len(md_text) < 2000):
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                separators=["\n\n", "\n", "|", " ", ""]
+            )
+        for section in markdown_splitter.split_text(self._clean_text(md_text)):
+            texts = text_splitter.split_text(section.page_content) if text_splitter else [section.page_content]
+            for text in texts:
+                batch.append(text, section.metadata)
+        return batch
+
+    def iter_file_chunk_batches(self, md_path, filename, extra_metadata=None, batch_size=256):
+        """Streams a markdown file as ChunkBatches of up to batch_size chunks."""
+        if not self.token_chunker:
+            streamer = StreamingChunker(self.chunk_size, self.chunk_overlap, self.headers_to_split_on)
+            yield from streamer.iter_file_chunk_batches(md_path, filename, extra_metadata, batch_size)
+            return
+        batch = ChunkBatch(self._shared_metadata(filename, extra_metadata))
+        for chunk in self.iter_file_chunks(md_path, filename, extra_metadata):
+            batch.append(chunk.page_content, chunk.metadata)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = ChunkBatch(self._shared_metadata(filename, extra_metadata))
+        if len(batch):
+            yield batch
+
+    def create_media_chunks(self, md_text, filename, extra_metadata=None):
+        """
+        Time-window chunks for transcripts/visual timelines, plus the untimed parts
+        (media summary etc.) chunked as usual. Windows carry start_sec/end_sec/window_index.
+        """
+        timed_chunks, untimed_text = self.media_chunker.chunk(self._clean_text(md_text), filename, extra_metadata)
+        if self.token_chunker:
+            timed_chunks = self.token_chunker.split_documents(timed_chunks)
+        untimed_chunks = self.create_chunks(untimed_text, filename, extra_metadata) if untimed_text else []
+        return timed_chunks + untimed_chunks
+
+    def create_hierarchical_chunks(self, md_text, filename, extra_metadata=None):
+        """
+        Small-to-big chunking. Returns (parents, children): parents are header-aware windows
+        of ~parent_size characters, children are chunk_size pieces of a parent. Only the
+        children are embedded; each child carries the `parent_id` the retriever expands to.
+        """
+        clean_text = self._clean_text(md_text)
+        markdown_splitter = MarkdownHeaderTextSplitter(
+            headers_to_split_on=self.headers_to_split_on,
+            strip_headers=False
+        )
+        header_splits = markdown_splitter.split_text(clean_text)
+
+        parent_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.parent_size,
+            chunk_overlap=0,
+            separators=["\n\n", "\n", "|", " ", ""]
+        )
+        child_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
+            separators=["\n\n", "\n", "|", " ", ""]
+        )
+
+        parents = parent_splitter.split_documents(header_splits)
+        children = []
+        for index, parent in enumerate(parents):
+            parent.metadata["source_file"] = filename
+            if extra_metadata:
+                parent.metadata.update(extra_metadata)
+            digest = hashlib.sha1(f"{filename}|{index}|{parent.page_content}".encode("utf-8")).hexdigest()
+            parent.metadata["parent_id"] = digest[:20]
+            parent.metadata["parent_index"] = index
+
+            for child in child_splitter.split_documents([parent]):
+                children.append(child)  # metadata (incl. parent_id) is copied from the parent
+
+        return parents, children
+
+    def iter_file_chunks(self, md_path, filename, extra_metadata=None):
+        """Single-pass streaming alternative to create_chunks for large markdown files."""
+        streamer = StreamingChunker(self.chunk_size, self.chunk_overlap, self.headers_to_split_on)
+        chunks = streamer.iter_file_chunks(md_path, filename, extra_metadata)
+        if not self.token_chunker:
+            return chunks
+        return self._fit_tokens(chunks)
+
+    def _fit_tokens(self, chunks, batch_size=64):
+        """Re-checks streamed chunks against the model window in tokenizer-sized batches."""
+        batch = []
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield from self.token_chunker.split_documents(batch)
+                batch = []
+        if batch:
+            yield from self.token_chunker.split_documents(batch)
+
+    def create_chunks_from_docling(self, source, filename, extra_metadata=None):
+        """
+        Chunks straight from the DoclingDocument tree (a DoclingDocument or the structured
+        JSON path from the parser): tables/lists stay intact, chunks carry page/section metadata.
+        """
+        from engine.chunkers.docling_chunker import DoclingChunker
+
+        docling_chunker = DoclingChunker(max_chars=self.chunk_size)
+        if isinstance(source, (str, Path)):
+            chunks = docling_chunker.chunk_file(source, filename, extra_metadata)
+        else:
+            chunks = docling_chunker.chunk_document(source, filename, extra_metadata)
+        if self.token_chunker:
+            chunks = self.token_chunker.split_documents(chunks)
+        return chunks
+
+    def token_report(self):
+        return self.token_chunker.report() if self.token_chunker else None
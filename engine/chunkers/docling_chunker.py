@@ -0,0 +1,158 @@
+import json
+from pathlib import Path
+from langchain_core.documents import Document
+from docling_core.types.doc.document import (
+    DoclingDocument,
+    TitleItem,
+    SectionHeaderItem,
+    ListItem,
+    TableItem,
+    PictureItem,
+    TextItem,
+)
+
+
+class DoclingChunker:
+    """
+    Chunks a DoclingDocument by walking its item tree instead of re-parsing exported markdown.
+
+    - Section headers/titles start new chunks and are carried as section metadata.
+    - Tables are always emitted whole (as a markdown table) with their caption.
+    - Consecutive list items are kept together as one block.
+    - Every chunk records page_start/page_end and the bounding box of its first item.
+    """
+
+    def __init__(self, max_chars=1500):
+        self.max_chars = max_chars
+
+    # ==========================================================
+    # HELPERS
+    # ==========================================================
+
+    def _item_pages(self, item):
+        return [p.page_no for p in (item.prov or [])]
+
+    def _item_bbox(self, item):
+        if not item.prov:
+            return None
+        b = item.prov[0].bbox
+        return f"{item.prov[0].page_no}:{b.l:.1f},{b.t:.1f},{b.r:.1f},{b.b:.1f}"
+
+    def _picture_text(self, item, document):
+        parts = []
+        caption = item.caption_text(document)
+        if caption:
+            parts.append(caption)
+        # Azure picture descriptions live in meta (new docling) or annotations (older)
+        meta = getattr(item, "meta", None)
+        description = getattr(meta, "description", None) if meta else None
+        if description is not None and getattr(description, "text", None):
+            parts.append(description.text)
+        else:
+            for annotation in item.annotations or []:
+                if getattr(annotation, "kind", None) == "description":
+                    parts.append(annotation.text)
+        return "\n".join(parts)
+
+    # ==========================================================
+    # PUBLIC METHODS
+    # ==========================================================
+
+    def chunk_document(self, document, filename, extra_metadata=None):
+        chunks = []
+        headings = {}             # level -> heading text
+        blocks, pages, bbox = [], [], None
+        size = 0
+        list_parent = None
+
+        def section_metadata():
+            ordered = [headings[level] for level in sorted(headings)]
+            metadata = {f"Header {i + 1}": text for i, text in enumerate(ordered[:3])}
+            metadata["section"] = " > ".join(ordered)
+            return metadata
+
+        def make_chunk(text, chunk_pages, chunk_bbox, chunk_type):
+            metadata = section_metadata()
+            metadata["source_file"] = filename
+            metadata["chunk_type"] = chunk_type
+            if chunk_pages:
+                metadata["page_start"] = min(chunk_pages)
+                metadata["page_end"] = max(chunk_pages)
+            if chunk_bbox:
+                metadata["bbox"] = chunk_bbox
+            if extra_metadata:
+                metadata.update(extra_metadata)
+            # Section path in the text so the LLM sees where the passage comes from
+            heading = metadata["section"]
+            content = f"{heading}\n\n{text}" if heading else text
+            return Document(page_content=content, metadata=metadata)
+
+        def flush():
+            nonlocal blocks, pages, bbox, size
+            text = "\n\n".join(b for b in blocks if b.strip())
+            if text.strip():
+                chunks.append(make_chunk(text, pages, bbox, "text"))
+            blocks, pages, bbox, size = [], [], None, 0
+
+        def add_block(text, item):
+            nonlocal bbox, size
+            if size and size + len(text) > self.max_chars:
+                flush()
+            if bbox is None:
+                bbox = self._item_bbox(item)
+            blocks.append(text)
+            pages.extend(self._item_pages(item))
+            size += len(text) + 2
+
+        # Captions are emitted with their table/picture, not again as standalone text
+        caption_refs = {ref.cref for owner in list(document.tables) + list(document.pictures)
+                        for ref in owner.captions}
+
+        for item, _level in document.iterate_items():
+            if getattr(item, "self_ref", None) in caption_refs:
+                continue
+            if isinstance(item, ListItem):
+                marker = item.marker or "-"
+                line = f"{marker} {item.text}"
+                parent = item.parent.cref if item.parent else None
+                # Keep a whole list in one block: extend the previous block while the parent is the same
+                if blocks and parent == list_parent:
+                    blocks[-1] += "\n" + line
+                    pages.extend(self._item_pages(item))
+                    size += len(line) + 1
+                else:
+                    add_block(line, item)
+                list_parent = parent
+                continue
+            list_parent = None
+
+            if isinstance(item, (TitleItem, SectionHeaderItem)):
+                flush()
+                level = 0 if isinstance(item, TitleItem) else item.level
+                for deeper in [lvl for lvl in headings if lvl >= level]:
+                    del headings[deeper]
+                headings[level] = item.text
+            elif isinstance(item, TableItem):
+                # Tables are never split: emit them on their own
+                flush()
+                # Includes the caption
+                text = item.export_to_markdown(doc=document)
+                if text.strip():
+                    chunks.append(make_chunk(text, self._item_pages(item), self._item_bbox(item), "table"))
+            elif isinstance(item, PictureItem):
+                text = self._picture_text(item, document)
+                if text:
+                    add_block(f"[Picture] {text}", item)
+            elif isinstance(item, TextItem) and item.text.strip():
+                add_block(item.text, item)
+
+        flush()
+        return chunks
+
+    def chunk_file(self, json_path, filename, extra_metadata=None):
+        """Loads the structured JSON written by SmartDocumentParser._save_outputs and chunks it."""
+        with open(Path(json_path), "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        # _save_outputs wraps the document in {"metadata": ..., "document": ...}
+        document = DoclingDocument.model_validate(payload.get("document", payload))
+        return self.chunk_document(document, filename, extra_metadata)
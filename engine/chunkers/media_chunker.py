@@ -0,0 +1,106 @@
+import re
+from langchain_core.documents import Document
+
+# Docling ASR lines: "[time: 12.34-18.90] text" (optionally followed by a [speaker:..] tag)
+_TIME_RANGE = re.compile(r'\[time:\s*([\d.]+)\s*-\s*([\d.]+)\]\s*')
+# VISUAL TIMELINE entries written by extract_and_summarize_frames: "**[12s]:** description"
+_FRAME_MARK = re.compile(r'^\*\*\[(\d+)s\]:\*\*\s*')
+_HEADER = re.compile(r'^#{1,6}\s')
+
+
+def format_seconds(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class MediaChunker:
+    """
+    Splits audio/video markdown on time windows instead of characters.
+
+    Transcript segments and visual-timeline frames are grouped into fixed windows of
+    `window_seconds`; each chunk carries numeric start_sec/end_sec and a window_index so
+    time questions can be answered by metadata lookup and neighbours fetched by index.
+    Anything without a timestamp (media summary, headers) is returned separately.
+    """
+
+    def __init__(self, window_seconds=60, max_chars=1500, frame_interval=4):
+        self.window_seconds = window_seconds
+        self.max_chars = max_chars
+        self.frame_interval = frame_interval
+
+    def parse_segments(self, md_text):
+        """Returns (segments, untimed_text); segments are (start, end, kind, text) sorted by start."""
+        segments, untimed = [], []
+        frame = None  # visual frame being collected: [start, lines]
+
+        def close_frame():
+            nonlocal frame
+            if frame:
+                text = " ".join(line.strip() for line in frame[1] if line.strip())
+                segments.append((frame[0], frame[0] + self.frame_interval, "visual", text))
+            frame = None
+
+        for line in md_text.splitlines():
+            time_match = _TIME_RANGE.search(line)
+            frame_match = _FRAME_MARK.match(line.strip())
+
+            if time_match:
+                close_frame()
+                start, end = float(time_match.group(1)), float(time_match.group(2))
+                text = _TIME_RANGE.sub("", line).strip()
+                if text:
+                    segments.append((start, max(end, start), "transcript", text))
+            elif frame_match:
+                close_frame()
+                frame = [float(frame_match.group(1)), [line.strip()[frame_match.end():]]]
+            elif frame and not _HEADER.match(line):
+                frame[1].append(line)   # description continues (Frame-OCR etc.)
+            else:
+                close_frame()
+                untimed.append(line)
+
+        close_frame()
+        segments.sort(key=lambda seg: seg[0])
+        untimed_text = "\n".join(untimed).strip()
+        # Only headers / separators left (e.g. "## VISUAL TIMELINE"): nothing worth a chunk
+        if all(_HEADER.match(line) or line.strip() in ("", "---") for line in untimed):
+            untimed_text = ""
+        return segments, untimed_text
+
+    def chunk(self, md_text, filename, extra_metadata=None):
+        """Returns (timed_chunks, untimed_text)."""
+        segments, untimed_text = self.parse_segments(md_text)
+        chunks = []
+        window, lines, start, end, size = None, [], None, None, 0
+
+        def emit():
+            if not lines:
+                return
+            label = f"{format_seconds(start)}-{format_seconds(end)}"
+            metadata = {
+                "source_file": filename,
+                "chunk_type": "media_window",
+                "start_sec": float(start),
+                "end_sec": float(end),
+                "window_index": len(chunks),
+                "time_label": label,
+            }
+            if extra_metadata:
+                metadata.update(extra_metadata)
+            # Time range in the text too, so the LLM can cite it
+            chunks.append(Document(page_content=f"[{label}]\n" + "\n".join(lines), metadata=metadata))
+
+        for seg_start, seg_end, kind, text in segments:
+            line = f"[{format_seconds(seg_start)}] {'(visual) ' if kind == 'visual' else ''}{text}"
+            seg_window = int(seg_start // self.window_seconds)
+            if lines and (seg_window != window or size + len(line) > self.max_chars):
+                emit()
+                lines, start, size = [], None, 0
+            if start is None:
+                start, end = seg_start, seg_end
+            window = seg_window
+            end = max(end, seg_end)
+            lines.append(line)
+            size += len(line) + 1
+        emit()
+        return chunks, untimed_text
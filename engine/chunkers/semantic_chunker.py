@@ -0,0 +1,98 @@
+import re
+import numpy as np
+from langchain_core.documents import Document
+
+# Sentence ends, or line breaks (markdown tables/lists have one item per line)
+_SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"(\[])|\n+')
+
+
+class SemanticChunker:
+    """
+    Places chunk boundaries where the topic changes instead of at fixed character counts.
+
+    Sentences are embedded in batches with the same model as the vector store, the cosine
+    distance between neighbours is computed in one vectorized NumPy pass, and boundaries go
+    at the largest distance jumps (above `breakpoint_percentile`), subject to min/max size.
+    """
+
+    def __init__(self, embeddings, breakpoint_percentile=90, min_chars=300, max_chars=1500, batch_size=64):
+        self.embeddings = embeddings
+        self.breakpoint_percentile = breakpoint_percentile
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.batch_size = batch_size
+
+    def split_sentences(self, text):
+        """Returns (start, end) character spans of the sentences/lines in text."""
+        spans, start = [], 0
+        for match in _SENTENCE_SPLIT.finditer(text):
+            if text[start:match.start()].strip():
+                spans.append((start, match.start()))
+            start = match.end()
+        if text[start:].strip():
+            spans.append((start, len(text)))
+        return spans
+
+    def _embed(self, sentences):
+        vectors = []
+        for start in range(0, len(sentences), self.batch_size):
+            vectors.extend(self.embeddings.embed_documents(sentences[start:start + self.batch_size]))
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def breakpoints(self, sentences):
+        """Indices i where a boundary should go *after* sentence i (topic shift)."""
+        if len(sentences) < 3:
+            return set()
+        matrix = self._embed(sentences)
+        # Cosine distance between each sentence and the next, all at once
+        distances = 1.0 - np.einsum("ij,ij->i", matrix[:-1], matrix[1:])
+        threshold = np.percentile(distances, self.breakpoint_percentile)
+        return set(np.nonzero(distances > threshold)[0].tolist())
+
+    def chunk_sections(self, sections, filename, extra_metadata=None):
+        """
+        Chunks a list of LangChain Documents (e.g. markdown header splits). Section edges are
+        always boundaries; inside a section boundaries follow the similarity drops.
+        """
+        # Embed every sentence of the document in one batched run
+        flat, owners, spans = [], [], []
+        for section_index, section in enumerate(sections):
+            for start, end in self.split_sentences(section.page_content):
+                flat.append(section.page_content[start:end].strip())
+                owners.append(section_index)
+                spans.append((start, end))
+        if not flat:
+            return []
+        cut_after = self.breakpoints(flat)
+
+        chunks = []
+        first = None  # index of the first sentence in the current chunk
+
+        def emit(last):
+            nonlocal first
+            if first is not None:
+                section = sections[owners[last]]
+                # Slice the original text so line breaks/tables keep their formatting
+                text = section.page_content[spans[first][0]:spans[last][1]].strip()
+                metadata = dict(section.metadata)
+                metadata["source_file"] = filename
+                metadata["chunk_method"] = "semantic"
+                if extra_metadata:
+                    metadata.update(extra_metadata)
+                chunks.append(Document(page_content=text, metadata=metadata))
+            first = None
+
+        for i in range(len(flat)):
+            if first is not None and spans[i][1] - spans[first][0] > self.max_chars:
+                emit(i - 1)
+            if first is None:
+                first = i
+
+            size = spans[i][1] - spans[first][0]
+            last_in_section = i + 1 == len(flat) or owners[i + 1] != owners[i]
+            if last_in_section or (i in cut_after and size >= self.min_chars):
+                emit(i)
+
+        return chunks
@@ -0,0 +1,171 @@
+import re
+from pathlib import Path
+from langchain_core.documents import Document
+from engine.chunkers.chunk_batch import ChunkBatch
+
+# Same removals as RAGChunker._clean_text, folded into one pattern applied per line:
+# ![Image](...) tags, [image_001] placeholders and local Windows image/PDF paths
+_CLEAN_PATTERN = re.compile(
+    r'!\[Image\]\(.*?\)'
+    r'|\[image_\d+\]'
+    r'|[A-Z]:\\(?:[\w \t.-]+\\)*[\w \t.-]+\.(?:png|jpg|jpeg|pdf)'
+)
+_HEADER_PATTERN = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+
+
+class StreamingChunker:
+    """
+    Cleans and splits markdown in a single pass over its lines.
+
+    Produces the same shape of output as RAGChunker.create_chunks (header metadata,
+    headers kept in the text, size-bounded chunks with overlap) but only ever holds
+    the current section's chunk in memory, and yields chunks as soon as they are full.
+    """
+
+    def __init__(self, chunk_size=1500, chunk_overlap=200, headers_to_split_on=None):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        headers_to_split_on = headers_to_split_on or [("#", "Header 1"), ("##", "Header 2"), ("###", "Header 3")]
+        # "##" -> (2, "Header 2")
+        self.header_levels = {len(marker): name for marker, name in headers_to_split_on}
+
+    def _overlap_tail(self, text):
+        """Last ~chunk_overlap characters of a chunk, starting on a word boundary."""
+        if self.chunk_overlap <= 0 or len(text) <= self.chunk_overlap:
+            return ""
+        tail = text[-self.chunk_overlap:]
+        space = tail.find(" ")
+        return tail[space + 1:] if space != -1 else tail
+
+    def _split_long_line(self, line, first_limit=None):
+        """
+        Hard-splits a single line longer than chunk_size, preferring table pipes and spaces.
+        `first_limit` shortens the first piece (room for a header already in the chunk).
+        """
+        limit = first_limit or self.chunk_size
+        while len(line) > limit:
+            cut = max(line.rfind("|", 0, limit), line.rfind(" ", 0, limit))
+            if cut <= 0:
+                cut = limit
+            yield line[:cut]
+            line = line[cut:]
+            limit = self.chunk_size
+        if line:
+            yield line
+
+    def iter_chunks(self, lines, filename, extra_metadata=None, split_sections=True):
+        """
+        Yields LangChain Documents from an iterable of markdown lines (e.g. an open file).
+        With split_sections=False each header section becomes one chunk (small docs/images).
+        """
+        for text, headers in self._iter_texts(lines, split_sections):
+            metadata = dict(headers)
+            metadata["source_file"] = filename
+            if extra_metadata:
+                metadata.update(extra_metadata)
+            yield Document(page_content=text, metadata=metadata)
+
+    def iter_chunk_batches(self, lines, filename, extra_metadata=None, split_sections=True, batch_size=256):
+        """Same chunks as iter_chunks, appended straight into ChunkBatches of up to batch_size."""
+        shared = {"source_file": filename, **(extra_metadata or {})}
+        batch = ChunkBatch(shared)
+        for text, headers in self._iter_texts(lines, split_sections):
+            batch.append(text, headers)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = ChunkBatch(shared)
+        if len(batch):
+            yield batch
+
+    def _iter_texts(self, lines, split_sections):
+        """
+        Yields (text, headers) per chunk. `headers` is the live header dict: copy it
+        before the next chunk is requested.
+        """
+        headers = {}
+        buffer, size = [], 0
+        blank_run = 0
+        in_code_block = False
+        # Buffer holds only section header line(s) so far: never emitted on their own
+        header_only = False
+
+        def emit():
+            text = "".join(buffer).strip()
+            return (text, headers) if text else None
+
+        for raw_line in lines:
+            line = raw_line.rstrip("\r\n")
+            # Cheap substring test first: most lines have nothing to clean
+            if "[" in line or ":\\" in line:
+                line = _CLEAN_PATTERN.sub("", line)
+
+            # Collapse 3+ newlines into one blank line (what the \n{3,} pass used to do)
+            if not line.strip():
+                blank_run += 1
+                if blank_run > 1 or not buffer:
+                    continue
+                buffer.append("\n")
+                size += 1
+                continue
+            blank_run = 0
+
+            if line.lstrip().startswith("```"):
+                in_code_block = not in_code_block
+
+            header = None if in_code_block else _HEADER_PATTERN.match(line)
+            is_section_header = bool(header) and len(header.group(1)) in self.header_levels
+            if is_section_header:
+                level = len(header.group(1))
+                # New section: flush, then reset deeper header levels. A header with no text
+                # under it stays in front of the next one instead of becoming a chunk.
+                if not header_only:
+                    chunk = emit()
+                    if chunk:
+                        yield chunk
+                    buffer, size = [], 0
+                for depth in list(self.header_levels):
+                    if depth >= level:
+                        headers.pop(self.header_levels[depth], None)
+                headers[self.header_levels[level]] = header.group(2)
+
+            # A pending header goes out with the first piece of its section
+            first_limit = None
+            if header_only and not is_section_header and size < self.chunk_size // 2:
+                first_limit = self.chunk_size - size - 1
+            pieces = self._split_long_line(line, first_limit) if split_sections else [line]
+            for piece in pieces:
+                if split_sections and size + len(piece) + 1 > self.chunk_size and buffer:
+                    chunk = emit()
+                    if chunk:
+                        yield chunk
+                    tail = self._overlap_tail(chunk[0]) if chunk else ""
+                    if len(tail) + len(piece) + 1 > self.chunk_size:
+                        tail = ""  # No room for overlap in front of this piece
+                    buffer = [tail + "\n"] if tail else []
+                    size = len(tail)
+                buffer.append(piece + "\n")
+                size += len(piece) + 1
+            header_only = is_section_header
+
+        # A trailing header with no text under it is not a chunk either
+        if not header_only:
+            chunk = emit()
+            if chunk:
+                yield chunk
+
+    def _split_sections(self, md_path, filename, small_file_chars):
+        # Mirrors RAGChunker: images and small files keep whole header sections
+        image_extensions = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tiff')
+        return not (filename.lower().endswith(image_extensions) or Path(md_path).stat().st_size < small_file_chars)
+
+    def iter_file_chunks(self, md_path, filename, extra_metadata=None, small_file_chars=2000):
+        """Streams chunks straight from a markdown file on disk."""
+        split_sections = self._split_sections(md_path, filename, small_file_chars)
+        with open(md_path, "r", encoding="utf-8") as f:
+            yield from self.iter_chunks(f, filename, extra_metadata, split_sections=split_sections)
+
+    def iter_file_chunk_batches(self, md_path, filename, extra_metadata=None, batch_size=256, small_file_chars=2000):
+        """iter_file_chunks as ChunkBatches (no Document per chunk)."""
+        split_sections = self._split_sections(md_path, filename, small_file_chars)
+        with open(md_path, "r", encoding="utf-8") as f:
+            yield from self.iter_chunk_batches(f, filename, extra_metadata, split_sections, batch_size)
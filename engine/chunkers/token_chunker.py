@@ -0,0 +1,120 @@
+import threading
+from langchain_core.documents import Document
+from engine.model_registry import tokenizer_lock
+
+
+class TokenAwareChunker:
+    """
+    Splits documents by the embedding model's own tokenizer so every chunk fits the
+    model window (bge-small truncates at 512 tokens, including [CLS]/[SEP]).
+
+    Lengths are measured with the fast (Rust) tokenizer in batches, oversized texts are
+    cut into token windows aligned to line/sentence ends, and running statistics show
+    how much text would have been silently truncated by character-based chunking.
+    """
+
+    def __init__(self, model_name="BAAI/bge-small-en-v1.5", max_tokens=None, overlap_tokens=32, batch_size=64):
+        from engine.model_registry import get_tokenizer
+
+        # Shared with every other chunker in the process (loaded once)
+        self.tokenizer = get_tokenizer(model_name)
+        # Leave room for the special tokens the model adds around every input
+        model_window = min(self.tokenizer.model_max_length, 512)
+        special = self.tokenizer.num_special_tokens_to_add(pair=False)
+        self.model_limit = model_window - special
+        self.max_tokens = min(max_tokens or self.model_limit, self.model_limit)
+        self.overlap_tokens = overlap_tokens
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self.stats = {
+            "chunks_in": 0,
+            "chunks_out": 0,
+            "chunks_over_limit": 0,     # longer than max_tokens, split
+            "tokens_over_limit": 0,     # tokens past the model window the model would have dropped
+            "max_tokens_seen": 0,
+            "tokens_total": 0,
+        }
+
+    def count_tokens(self, texts):
+        """Token counts (without special tokens) for a list of texts, tokenized in batches."""
+        counts = []
+        for start in range(0, len(texts), self.batch_size):
+            with tokenizer_lock:
+                encoded = self.tokenizer(texts[start:start + self.batch_size], add_special_tokens=False, verbose=False)
+            counts.extend(len(ids) for ids in encoded["input_ids"])
+        return counts
+
+    def _window_end(self, text, offsets, start, end):
+        """Moves a window end back to a newline/sentence boundary if one is close."""
+        if end >= len(offsets):
+            return len(offsets)
+        floor = start + int((end - start) * 0.8)
+        for j in range(end, floor, -1):
+            char_end = offsets[j - 1][1]
+            if char_end < len(text) and text[char_end] == "\n":
+                return j
+            if text[offsets[j - 1][0]:char_end] in (".", "!", "?", "|"):
+                return j
+        return end
+
+    def _split_text(self, text, offsets):
+        pieces = []
+        start = 0
+        while start < len(offsets):
+            end = self._window_end(text, offsets, start, start + self.max_tokens)
+            pieces.append(text[offsets[start][0]:offsets[end - 1][1]].strip())
+            if end >= len(offsets):
+                break
+            start = max(end - self.overlap_tokens, start + 1)
+        return [p for p in pieces if p]
+
+    def split_documents(self, documents):
+        """Returns documents that are all guaranteed to fit within max_tokens."""
+        output = []
+        stats = {key: 0 for key in self.stats}
+
+        for start in range(0, len(documents), self.batch_size):
+            batch = documents[start:start + self.batch_size]
+            with tokenizer_lock:
+                encoded = self.tokenizer(
+                    [doc.page_content for doc in batch],
+                    add_special_tokens=False,
+                    return_offsets_mapping=True,
+                    verbose=False
+                )
+            for doc, ids, offsets in zip(batch, encoded["input_ids"], encoded["offset_mapping"]):
+                n_tokens = len(ids)
+                stats["chunks_in"] += 1
+                stats["tokens_total"] += n_tokens
+                stats["max_tokens_seen"] = max(stats["max_tokens_seen"], n_tokens)
+
+                if n_tokens <= self.max_tokens:
+                    output.append(doc)
+                    continue
+
+                stats["chunks_over_limit"] += 1
+                stats["tokens_over_limit"] += max(n_tokens - self.model_limit, 0)
+                for i, piece in enumerate(self._split_text(doc.page_content, offsets)):
+                    output.append(Document(page_content=piece, metadata={**doc.metadata, "token_part": i}))
+
+        stats["chunks_out"] = len(output)
+        with self._lock:
+            for key, value in stats.items():
+                if key == "max_tokens_seen":
+                    self.stats[key] = max(self.stats[key], value)
+                else:
+                    self.stats[key] += value
+        return output
+
+    def report(self):
+        s = self.stats
+        if not s["chunks_in"]:
+            return "Token chunking: no chunks processed."
+        avg = s["tokens_total"] / s["chunks_in"]
+        return (
+            f"Token chunking: {s['chunks_in']} -> {s['chunks_out']} chunks | "
+            f"{s['chunks_over_limit']} over the {self.max_tokens}-token limit "
+            f"({s['tokens_over_limit']} tokens past the {self.model_limit}-token model window would have been truncated) | "
+            f"avg {avg:.0f} tokens ({avg / self.max_tokens:.0%} of window), max {s['max_tokens_seen']}"
+        )
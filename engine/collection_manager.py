@@ -0,0 +1,149 @@
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from engine.chroma_pool import memory_budget_bytes
+from engine.chunk_manifest import drop_manifest
+from engine.dedup import drop_deduplicator
+from engine.quantized_store import drop_quantized_store
+from engine.sparse_index import drop_sparse_index
+from engine.time_index import drop_time_index
+
+# HNSW graph links per vector (M=16 neighbours, two layers' worth) + id/bookkeeping
+_INDEX_OVERHEAD_BYTES = 16 * 2 * 4 + 64
+
+
+def estimate_retriever_bytes(retriever):
+    """Quantized cases are searched from their memmap codes, not Chroma's float32 index."""
+    quantized = getattr(retriever, "quantized_store", None)
+    if quantized is not None:
+        return quantized.resident_bytes()
+    return estimate_collection_bytes(retriever.vector_db._collection)
+
+
+def estimate_collection_bytes(collection):
+    """Approximate resident size of a loaded collection: float32 vectors + HNSW links."""
+    count = collection.count()
+    if not count:
+        return 0
+    sample = collection.get(limit=1, include=["embeddings"])
+    dim = len(sample["embeddings"][0]) if len(sample["embeddings"]) else 384
+    return count * (dim * 4 + _INDEX_OVERHEAD_BYTES)
+
+
+def drop_case_state(case_id):
+    """Drops the per-case singletons (SQLite connection, memmaps, JSON indexes) of an unloaded case."""
+    drop_sparse_index(case_id)
+    drop_quantized_store(case_id)
+    drop_time_index(case_id)
+    drop_manifest(case_id)
+    drop_deduplicator(case_id)
+
+
+class CaseCollectionManager:
+    """
+    Keeps retrievers for recently used cases loaded, least recently used first out.
+
+    Every case is its own Chroma collection; building a retriever and loading its
+    index per request is what made /chat slow on cold cases. Handles stay cached until
+    the estimated footprint of the loaded cases passes `memory_budget` bytes (or more
+    than `max_cases` are loaded), then the coldest cases are dropped. Chroma's own
+    segment cache is capped at the same budget (see chroma_pool.client_settings).
+    """
+
+    def __init__(self, retriever_factory, memory_budget=None, max_cases=64):
+        self.retriever_factory = retriever_factory
+        # CASE_MEMORY_BUDGET_MB by default; 0 = only max_cases applies
+        self.memory_budget = memory_budget if memory_budget is not None else memory_budget_bytes()
+        self.max_cases = max_cases
+        self._cases = OrderedDict()   # case_id -> {"retriever", "bytes", "loaded_at"}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.stats_counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, case_id):
+        """Retriever for a case, loading it on a miss."""
+        with self._lock:
+            entry = self._cases.get(case_id)
+            if entry is not None:
+                self._cases.move_to_end(case_id)
+                self.stats_counters["hits"] += 1
+                return entry["retriever"]
+            load_lock = self._load_locks.setdefault(case_id, threading.Lock())
+
+        # Per-case lock: concurrent requests for one cold case load it once,
+        # other cases keep being served meanwhile
+        with load_lock:
+            with self._lock:
+                entry = self._cases.get(case_id)
+                if entry is not None:
+                    self._cases.move_to_end(case_id)
+                    self.stats_counters["hits"] += 1
+                    return entry["retriever"]
+
+            started = time.perf_counter()
+            retriever = self.retriever_factory(case_id)
+            size = estimate_retriever_bytes(retriever)
+            print(f"📂 Loaded case {case_id} ({size / 1e6:.1f} MB est.) in {time.perf_counter() - started:.2f}s")
+
+            with self._lock:
+                self.stats_counters["misses"] += 1
+                self._cases[case_id] = {"retriever": retriever, "bytes": size, "loaded_at": time.time()}
+                self._evict()
+            return retriever
+
+    def _evict(self):
+        """Drops least recently used cases until within budget (never the one just loaded)."""
+        while len(self._cases) > 1 and (
+            len(self._cases) > self.max_cases
+            or (self.memory_budget and self._total_bytes() > self.memory_budget)
+        ):
+            case_id, entry = self._cases.popitem(last=False)
+            drop_case_state(case_id)
+            self.stats_counters["evictions"] += 1
+            print(f"📤 Evicted case {case_id} ({entry['bytes'] / 1e6:.1f} MB est.)")
+
+    def _total_bytes(self):
+        return sum(entry["bytes"] for entry in self._cases.values())
+
+    def refresh(self, case_id):
+        """Re-estimates a loaded case after ingestion changed its size."""
+        with self._lock:
+            entry = self._cases.get(case_id)
+        if entry is None:
+            return
+        size = estimate_retriever_bytes(entry["retriever"])
+        with self._lock:
+            if case_id in self._cases:
+                self._cases[case_id]["bytes"] = size
+                self._evict()
+
+    def release(self, case_id):
+        """Forgets a case's handle (after its files were deleted or the case purged)."""
+        with self._lock:
+            self._cases.pop(case_id, None)
+            drop_case_state(case_id)
+
+    @contextmanager
+    def unloaded(self, case_id):
+        """
+        Keeps a case out of the cache while its data is purged: the handle is dropped and
+        concurrent get()s wait on the case's load lock, then load it fresh afterwards.
+        """
+        with self._lock:
+            load_lock = self._load_locks.setdefault(case_id, threading.Lock())
+        with load_lock:
+            self.release(case_id)
+            yield
+
+    def stats(self):
+        with self._lock:
+            lookups = self.stats_counters["hits"] + self.stats_counters["misses"]
+            return {
+                **self.stats_counters,
+                "hit_rate": round(self.stats_counters["hits"] / lookups, 3) if lookups else None,
+                "loaded_cases": list(self._cases),
+                "loaded_bytes": self._total_bytes(),
+                "memory_budget_bytes": self.memory_budget,
+                "max_cases": self.max_cases,
+            }
@@ -0,0 +1,564 @@
+import io
+import os
+import re
+import json
+import random
+import hashlib
+import zipfile
+import threading
+from pathlib import Path
+import numpy as np
+from engine.chunkers.chunk_batch import ChunkBatch, ChunkRecord
+
+# MinHash parameters: 128 permutations split into 32 LSH bands of 4 rows.
+# With these settings documents with Jaccard >= ~0.8 almost always share a band.
+NUM_PERM = 128
+NUM_BANDS = 32
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+
+# Multiply-shift hash family evaluated with wrapping uint64 arithmetic in NumPy.
+# Fixed seed so signatures are stable across runs.
+_rng = random.Random(1337)
+_HASH_A = np.array([_rng.getrandbits(64) | 1 for _ in range(NUM_PERM)], dtype=np.uint64)[:, None]
+_HASH_B = np.array([_rng.getrandbits(64) for _ in range(NUM_PERM)], dtype=np.uint64)[:, None]
+_BLOCK = 8192
+
+
+def _normalize(text):
+    """Lowercases and collapses punctuation/whitespace so exports of the same file compare equal."""
+    text = text.lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _shingles(text, k=5):
+    """Word k-shingles hashed to 32-bit ints."""
+    words = text.split()
+    if len(words) < k:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = (" ".join(words[i:i + k]) for i in range(len(words) - k + 1))
+    return {
+        int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little")
+        for g in grams
+    }
+
+
+def minhash_signature(text):
+    """Returns a NUM_PERM MinHash signature for the normalized text (empty list if no text)."""
+    shingles = _shingles(_normalize(text))
+    if not shingles:
+        return []
+    values = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+    signature = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    # Process shingles in blocks so memory stays at NUM_PERM x _BLOCK
+    for start in range(0, len(values), _BLOCK):
+        block = values[None, start:start + _BLOCK]
+        hashed = (_HASH_A * block + _HASH_B) >> np.uint64(32)
+        np.minimum(signature, hashed.min(axis=1), out=signature)
+    return signature.tolist()
+
+
+def estimate_jaccard(sig_a, sig_b):
+    if not sig_a or not sig_b:
+        return 0.0
+    matches = sum(1 for a, b in zip(sig_a, sig_b) if a == b)
+    return matches / len(sig_a)
+
+
+def extract_cheap_text(file_path, max_chars=200_000, data=None):
+    """
+    Fast text extraction used only for duplicate detection (no layout, OCR or vision).
+    Returns "" for formats we cannot read cheaply (scans, media) so callers fall
+    back to an exact content hash. Pass `data` for in-memory archive members.
+    """
+    file_path = Path(file_path)
+    ext = file_path.suffix.lower()
+    try:
+        if ext in (".txt", ".md", ".csv", ".html", ".htm", ".eml"):
+            if data is not None:
+                text = data[:max_chars * 4].decode("utf-8", errors="ignore")[:max_chars]
+            else:
+                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                    text = f.read(max_chars)
+            if ext in (".html", ".htm"):
+                text = re.sub(r"<[^>]+>", " ", text)
+            return text
+
+        if ext == ".pdf":
+            import pypdfium2 as pdfium
+            pdf = pdfium.PdfDocument(data if data is not None else str(file_path))
+            parts, size = [], 0
+            try:
+                for page in pdf:
+                    text = page.get_textpage().get_text_range()
+                    parts.append(text)
+                    size += len(text)
+                    if size >= max_chars:
+                        break
+            finally:
+                pdf.close()
+            return "".join(parts)[:max_chars]
+
+        if ext in (".docx", ".pptx", ".xlsx"):
+            # Office files are zips of XML; stripping tags is enough for shingling
+            with zipfile.ZipFile(io.BytesIO(data) if data is not None else file_path) as zf:
+                parts, size = [], 0
+                for name in zf.namelist():
+                    if not name.endswith(".xml"):
+                        continue
+                    if not (name.startswith("word/") or name.startswith("ppt/slides/") or name.startswith("xl/sharedStrings")):
+                        continue
+                    xml = zf.read(name).decode("utf-8", errors="ignore")
+                    text = re.sub(r"<[^>]+>", " ", xml)
+                    parts.append(text)
+                    size += len(text)
+                    if size >= max_chars:
+                        break
+            return " ".join(parts)[:max_chars]
+    except Exception as e:
+        print(f"⚠️ Cheap text extraction failed for {file_path.name}: {e}")
+    return ""
+
+
+def file_sha256(file_path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class DocumentDeduplicator:
+    """
+    Per-case near-duplicate detector that runs before parsing.
+
+    Keeps a small JSON index per case (MinHash signatures + LSH buckets + exact hashes)
+    so a PDF, DOCX and re-export of the same document are only parsed and embedded once.
+    Only exact duplicates (same bytes, or same normalized text) are skipped; they are
+    recorded in `links` pointing at the original. Near-duplicates (MinHash similarity
+    >= threshold) are still indexed, since a draft with changed amounts or a reply on a
+    quoted thread is evidence too; they are recorded in `near`.
+    A checked file is only registered once it is indexed: check() holds it as pending
+    and finish() registers it (success) or drops it (parse/index failed).
+    """
+
+    def __init__(self, case_id, index_dir="data/dedup", threshold=0.85):
+        self.case_id = case_id
+        self.threshold = threshold
+        self.index_path = Path(index_dir) / f"{case_id}.json"
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.pending = {}                            # checked, not indexed yet (this process)
+        self._mtime = None
+        self._load()
+
+    def _refresh(self):
+        """Reloads the index if another process (main2, the server) rewrote it."""
+        try:
+            mtime = self.index_path.stat().st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            self._load()
+
+    def _load(self):
+        if self.index_path.exists():
+            self._mtime = self.index_path.stat().st_mtime
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        else:
+            self._mtime = None
+            data = {}
+        self.documents = data.get("documents", {})   # file_name -> {"sha256", "text_sha1", "signature"}
+        self.links = data.get("links", {})           # skipped exact duplicate -> original file_name
+        self.near = data.get("near", {})             # indexed near-duplicate -> most similar file_name
+        self._rebuild_buckets()
+
+    def _rebuild_buckets(self):
+        self.buckets = {}
+        for name, entry in {**self.documents, **self.pending}.items():
+            self._add_to_buckets(name, entry.get("signature", []))
+
+    def _save(self):
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"documents": self.documents, "links": self.links, "near": self.near}, f)
+        os.replace(tmp_path, self.index_path)
+        self._mtime = self.index_path.stat().st_mtime
+
+    def _band_keys(self, signature):
+        for band in range(NUM_BANDS):
+            start = band * ROWS_PER_BAND
+            yield f"{band}:" + ",".join(str(v) for v in signature[start:start + ROWS_PER_BAND])
+
+    def _add_to_buckets(self, name, signature):
+        if not signature:
+            return
+        for key in self._band_keys(signature):
+            self.buckets.setdefault(key, set()).add(name)
+
+    def _find_original(self, sha, text_sha, signature):
+        """(name, similarity, exact) of the closest document; exact = same bytes or same text."""
+        # Files still being ingested count too, so two copies uploaded together are indexed once
+        entries = {**self.documents, **self.pending}
+        for name, entry in entries.items():
+            if entry.get("sha256") == sha or (text_sha and entry.get("text_sha1") == text_sha):
+                return name, 1.0, True
+
+        if not signature:
+            return None, 0.0, False
+
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates |= self.buckets.get(key, set())
+
+        best_name, best_score = None, 0.0
+        for name in candidates:
+            score = estimate_jaccard(signature, entries[name].get("signature", []))
+            if score > best_score:
+                best_name, best_score = name, score
+        if best_score >= self.threshold:
+            return best_name, best_score, False
+        return None, best_score, False
+
+    def check(self, file_path, data=None, name=None):
+        """
+        Returns (original_name, similarity) if the file is an exact duplicate of a document
+        already in the case (skip it), otherwise (None, best_score) and holds the file as
+        pending until finish(). `data`/`name` let archive members be checked without touching disk.
+        """
+        file_path = Path(file_path)
+        name = name or file_path.name
+        sha = hashlib.sha256(data).hexdigest() if data is not None else file_sha256(file_path)
+        text = _normalize(extract_cheap_text(file_path, data=data))
+        text_sha = hashlib.sha1(text.encode("utf-8")).hexdigest() if text else None
+        signature = minhash_signature(text)
+
+        with self._lock:
+            self._refresh()
+            if name in self.documents and self.documents[name].get("sha256") == sha:
+                # Same file re-uploaded under the same name: let ingestion decide (not a cross-document dup)
+                return None, 1.0
+
+            original, score, exact = self._find_original(sha, text_sha, signature)
+            if original and original != name:
+                if exact:
+                    self.links[name] = original
+                    self._save()
+                    return original, score
+                print(f"ℹ️ {name} is a near-duplicate of {original} (similarity {score:.2f}), indexing it anyway")
+                self.near[name] = original
+
+            self.pending[name] = {"sha256": sha, "text_sha1": text_sha, "signature": signature}
+            self._add_to_buckets(name, signature)
+            return None, score
+
+    def finish(self, name, success):
+        """
+        Registers a checked file once it is indexed; forgets it if parsing/indexing failed.
+        Returns the copies that were skipped as duplicates of a failed file (not indexed:
+        the caller reports them so they can be ingested again).
+        """
+        with self._lock:
+            entry = self.pending.pop(name, None)
+            if entry is None:
+                return []
+            self._refresh()
+            orphans = []
+            if success:
+                self.documents[name] = entry
+            else:
+                orphans = sorted(dup for dup, orig in self.links.items() if orig == name)
+                self.links = {dup: orig for dup, orig in self.links.items() if orig != name}
+                self.near = {dup: orig for dup, orig in self.near.items() if name not in (dup, orig)}
+                self._rebuild_buckets()
+            self._save()
+            return orphans
+
+    def names(self):
+        """Indexed document names, as last saved by any process."""
+        with self._lock:
+            self._refresh()
+            return list(self.documents)
+
+    def forget(self, file_name):
+        """Drops a document (and any links to/from it) from the index."""
+        with self._lock:
+            self._refresh()
+            self.documents.pop(file_name, None)
+            self.links.pop(file_name, None)
+            self.links = {dup: orig for dup, orig in self.links.items() if orig != file_name}
+            self.near = {dup: orig for dup, orig in self.near.items() if file_name not in (dup, orig)}
+            self._rebuild_buckets()
+            self._save()
+
+    def clear(self):
+        """Empties the whole case index (case purge)."""
+        with self._lock:
+            self.documents, self.links, self.near, self.pending, self.buckets = {}, {}, {}, {}, {}
+            self._save()
+
+
+_deduplicators = {}
+_deduplicators_lock = threading.Lock()
+
+
+def get_deduplicator(case_id):
+    """One shared DocumentDeduplicator (index + lock) per case."""
+    with _deduplicators_lock:
+        if case_id not in _deduplicators:
+            _deduplicators[case_id] = DocumentDeduplicator(case_id)
+        return _deduplicators[case_id]
+
+
+def drop_deduplicator(case_id):
+    """
+    Forgets a case's DocumentDeduplicator when the case is unloaded. Kept while files are
+    checked but not finished: a second instance would not see them as pending.
+    """
+    with _deduplicators_lock:
+        deduplicator = _deduplicators.get(case_id)
+        if deduplicator is not None and not deduplicator.pending:
+            del _deduplicators[case_id]
+
+
+# ==========================================================
+# CHUNK-LEVEL DEDUP (headers, footers, disclaimers)
+# ==========================================================
+
+SIMHASH_BANDS = 4          # 4 x 16-bit bands: any fingerprint within 3 bits shares a band
+# "page 3 of 120" (normalized) in a running header/footer; only stripped from short chunks
+_PAGE_NUMBER = re.compile(r"\bpage \d+(?: of \d+)?\b")
+_FOOTER_MAX_WORDS = 12
+_BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+
+
+def _occurrence_label(source_file, page_start=None):
+    """"file" or "file#p<page>" entry of a chunk's occurrences list."""
+    label = source_file or "Unknown"
+    return f"{label}#p{page_start}" if page_start is not None else label
+
+
+def chunk_hash(text, parent_id=None):
+    """
+    Exact-duplicate key: SHA-1 of the normalized chunk text. Hierarchical child chunks
+    are keyed by their parent too, so a child is never folded into another parent's child
+    (its own parent window would become unreachable). Short chunks are hashed without
+    their page numbers, so "Confidential - Page 3 of 120" footers fold into one.
+    """
+    normalized = _normalize(text)
+    if normalized.count(" ") < _FOOTER_MAX_WORDS:
+        normalized = _PAGE_NUMBER.sub("page", normalized)
+    key = normalized if parent_id is None else f"{parent_id}\0{normalized}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def simhash64(text, k=3):
+    """64-bit SimHash over word k-shingles (0 for empty text)."""
+    words = _normalize(text).split()
+    grams = [" ".join(words[i:i + k]) for i in range(max(len(words) - k + 1, 1))] if words else []
+    if not grams:
+        return 0
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "little") for g in grams],
+        dtype=np.uint64
+    )
+    bits = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.int32)
+    votes = bits.sum(axis=0) * 2 - len(grams)
+    fingerprint = 0
+    for i in np.nonzero(votes > 0)[0].tolist():
+        fingerprint |= 1 << i
+    return fingerprint
+
+
+def simhash_bands(fingerprint):
+    return [(fingerprint >> (16 * band)) & 0xFFFF for band in range(SIMHASH_BANDS)]
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class ChunkDeduplicator:
+    """
+    Collapses repeated chunks so boilerplate that appears on every page is embedded and
+    stored once. The kept chunk gets `chunk_hash` and `occurrences` (JSON list of
+    "file" / "file#p<page>") / `occurrence_count`.
+
+    By default only chunks with the same normalized text are folded. Near-duplicate
+    folding (SimHash within `max_hamming` bits, adds `simhash` and `sh_b0`..`sh_b3`) is
+    opt-in: two statements that differ only in amounts or account numbers are
+    near-duplicates too, and folding them would drop one file's text.
+    Very short chunks (< min_words) are only deduplicated exactly.
+    """
+
+    def __init__(self, max_hamming=None, min_words=8):
+        self.max_hamming = max_hamming
+        self.min_words = min_words
+
+    def annotate(self, chunk):
+        text = chunk.page_content
+        self._set_fingerprints(chunk.metadata, text, chunk_hash(text, chunk.metadata.get("parent_id")))
+        label = _occurrence_label(chunk.metadata.get("source_file"), chunk.metadata.get("page_start"))
+        chunk.metadata["occurrences"] = json.dumps([label])
+        chunk.metadata["occurrence_count"] = 1
+        return chunk
+
+    def _set_fingerprints(self, metadata, text, digest):
+        metadata["chunk_hash"] = digest
+        if self.max_hamming is not None and len(text.split()) >= self.min_words:
+            fingerprint = simhash64(text)
+            metadata["simhash"] = format(fingerprint, "016x")
+            for band, value in enumerate(simhash_bands(fingerprint)):
+                metadata[f"sh_b{band}"] = value
+
+    def is_near_duplicate(self, meta_a, meta_b):
+        if meta_a.get("chunk_hash") == meta_b.get("chunk_hash"):
+            return True
+        if self.max_hamming is None or "simhash" not in meta_a or "simhash" not in meta_b:
+            return False
+        if meta_a.get("parent_id") != meta_b.get("parent_id"):
+            return False
+        return hamming(int(meta_a["simhash"], 16), int(meta_b["simhash"], 16)) <= self.max_hamming
+
+    def add_occurrence(self, kept_metadata, duplicate_metadata):
+        occurrences = json.loads(kept_metadata.get("occurrences", "[]"))
+        occurrences.extend(json.loads(duplicate_metadata.get("occurrences", "[]")))
+        kept_metadata["occurrences"] = json.dumps(sorted(set(occurrences)))
+        kept_metadata["occurrence_count"] = kept_metadata.get("occurrence_count", 1) + duplicate_metadata.get("occurrence_count", 1)
+
+    def drop_occurrences(self, metadata, source_file):
+        """
+        Metadata of a shared chunk with `source_file`'s occurrences removed and re-homed on
+        the next file that has it. None if no other file has the chunk.
+        """
+        others = [label for label in json.loads(metadata.get("occurrences", "[]"))
+                  if label.split("#p")[0] != source_file]
+        if not others:
+            return None
+        new_file = others[0].split("#p")[0]
+        rehomed = {key: value for key, value in metadata.items() if key not in ("page_start", "page_end")}
+        rehomed["source_file"] = new_file
+        if "#p" in others[0]:
+            rehomed["page_start"] = rehomed["page_end"] = int(others[0].split("#p")[1])
+        rehomed["occurrences"] = json.dumps(others)
+        rehomed["occurrence_count"] = len(others)
+        return rehomed
+
+    def collapse(self, chunks):
+        """Deduplicates a batch in memory; returns the kept chunks (annotated)."""
+        if isinstance(chunks, ChunkBatch):
+            return self._collapse_batch(chunks)
+        kept = []
+        by_hash = {}
+        by_band = {}
+
+        for chunk in chunks:
+            self.annotate(chunk)
+            meta = chunk.metadata
+
+            match = by_hash.get(meta["chunk_hash"])
+            if match is None and "simhash" in meta:
+                for band in range(SIMHASH_BANDS):
+                    for candidate in by_band.get((band, meta[f"sh_b{band}"]), []):
+                        if self.is_near_duplicate(candidate.metadata, meta):
+                            match = candidate
+                            break
+                    if match is not None:
+                        break
+
+            if match is not None:
+                self.add_occurrence(match.metadata, meta)
+                continue
+
+            kept.append(chunk)
+            by_hash[meta["chunk_hash"]] = chunk
+            if "simhash" in meta:
+                for band in range(SIMHASH_BANDS):
+                    by_band.setdefault((band, meta[f"sh_b{band}"]), []).append(chunk)
+
+        return kept
+
+    def _collapse_batch(self, batch):
+        """
+        collapse() over a ChunkBatch's columns: hashes come from the texts and the
+        parent_id/source_file/page_start columns, and only kept chunks get a metadata dict.
+        """
+        texts = batch.texts()
+
+        def column(key):
+            values = batch.columns.get(key)
+            return values if values is not None else [batch.shared.get(key)] * len(texts)
+
+        parents, sources, pages = column("parent_id"), column("source_file"), column("page_start")
+        kept, labels = [], []
+        by_hash, by_band = {}, {}
+
+        for i, text in enumerate(texts):
+            digest = chunk_hash(text, parents[i])
+            match = by_hash.get(digest)
+            fingerprint = None
+            if match is None and self.max_hamming is not None and len(text.split()) >= self.min_words:
+                fingerprint = simhash64(text)
+                for band, value in enumerate(simhash_bands(fingerprint)):
+                    for candidate in by_band.get((band, value), []):
+                        meta = kept[candidate].metadata
+                        if meta.get("parent_id") == parents[i] and \
+                                hamming(int(meta["simhash"], 16), fingerprint) <= self.max_hamming:
+                            match = candidate
+                            break
+                    if match is not None:
+                        break
+
+            label = _occurrence_label(sources[i], pages[i])
+            if match is not None:
+                labels[match].append(label)
+                continue
+
+            metadata = batch.metadata(i)
+            self._set_fingerprints(metadata, text, digest)
+            by_hash[digest] = len(kept)
+            if "simhash" in metadata:
+                for band in range(SIMHASH_BANDS):
+                    by_band.setdefault((band, metadata[f"sh_b{band}"]), []).append(len(kept))
+            kept.append(ChunkRecord(text, metadata))
+            labels.append([label])
+
+        for chunk, chunk_labels in zip(kept, labels):
+            chunk.metadata["occurrences"] = json.dumps(sorted(set(chunk_labels)))
+            chunk.metadata["occurrence_count"] = len(chunk_labels)
+        return kept
+
+    def find_match(self, stored, metadata):
+        """
+        First stored (doc_id, metadata) that `metadata` duplicates. `stored` is the index
+        built by index_stored(): lookups by hash / SimHash band, not a scan.
+        """
+        by_hash, by_band = stored
+        match = by_hash.get(metadata["chunk_hash"])
+        if match is not None or "simhash" not in metadata:
+            return match
+        for band in range(SIMHASH_BANDS):
+            for candidate in by_band.get((band, metadata[f"sh_b{band}"]), []):
+                if self.is_near_duplicate(candidate[1], metadata):
+                    return candidate
+        return None
+
+    def index_stored(self, ids, metadatas):
+        by_hash, by_band = {}, {}
+        for doc_id, meta in zip(ids, metadatas):
+            by_hash.setdefault(meta.get("chunk_hash"), (doc_id, meta))
+            if "simhash" in meta:
+                for band in range(SIMHASH_BANDS):
+                    by_band.setdefault((band, meta.get(f"sh_b{band}")), []).append((doc_id, meta))
+        return by_hash, by_band
+
+    def existing_where(self, chunks):
+        """Chroma `where` filter that finds stored chunks that may duplicate `chunks`."""
+        clauses = [{"chunk_hash": {"$in": sorted({c.metadata["chunk_hash"] for c in chunks})}}]
+        for band in range(SIMHASH_BANDS):
+            values = sorted({c.metadata[f"sh_b{band}"] for c in chunks if f"sh_b{band}" in c.metadata})
+            if values:
+                clauses.append({f"sh_b{band}": {"$in": values}})
+        return clauses[0] if len(clauses) == 1 else {"$or": clauses}
@@ -0,0 +1,152 @@
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from pathlib import Path
+from langchain_core.embeddings import Embeddings
+
+
+def cache_key(model_name, text):
+    """Content address of a text for one model: whitespace-normalized, hashed."""
+    normalized = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha1(f"{model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent (model, text) -> vector cache in SQLite, shared by every case.
+
+    Vectors are stored as float32 blobs. When the cache grows past `max_entries`
+    the least recently used tenth is evicted, so it stays bounded on disk.
+    Hits don't write: their last_used times are buffered and written with the next
+    put, before an eviction, or once `touch_batch` keys are pending.
+    """
+
+    def __init__(self, db_path="data/embedding_cache.db", max_entries=2_000_000, touch_batch=1000):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self._touched = {}   # key -> last_used not written yet
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS vectors (
+                   key TEXT PRIMARY KEY,
+                   vector BLOB NOT NULL,
+                   last_used INTEGER NOT NULL
+               )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_vectors_last_used ON vectors(last_used)")
+        self.conn.commit()
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+        # Upper bound on the row count, so COUNT(*) only runs when eviction may be due
+        self._approx_count = self.conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def get_many(self, keys):
+        """Vectors for `keys` in order (None where not cached)."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})", batch)
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+            if found:
+                now = int(time.time())
+                self._touched.update((key, now) for key in found)
+                if len(self._touched) >= self.touch_batch:
+                    self._flush_touches()
+                    self.conn.commit()
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(keys) - len(found)
+        return [found.get(key) for key in keys]
+
+    def put_many(self, keys, vectors):
+        now = int(time.time())
+        rows = [(key, array("f", vector).tobytes(), now) for key, vector in zip(keys, vectors)]
+        with self._lock:
+            self._flush_touches()
+            self.conn.executemany("INSERT OR REPLACE INTO vectors VALUES (?, ?, ?)", rows)
+            self.conn.commit()
+            self._approx_count += len(rows)
+            if self._approx_count > self.max_entries:
+                self._evict()
+
+    def _flush_touches(self):
+        """Writes buffered last_used times (caller holds the lock and commits)."""
+        if self._touched:
+            self.conn.executemany("UPDATE vectors SET last_used = ? WHERE key = ?",
+                                  [(now, key) for key, now in self._touched.items()])
+            self._touched = {}
+
+    def _evict(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+        self._approx_count = count
+        if count <= self.max_entries:
+            return
+        excess = count - int(self.max_entries * 0.9)
+        self.conn.execute(
+            "DELETE FROM vectors WHERE key IN (SELECT key FROM vectors ORDER BY last_used LIMIT ?)", (excess,)
+        )
+        self.conn.commit()
+        self._approx_count -= excess
+        self.stats["evicted"] += excess
+
+    def report(self):
+        s = self.stats
+        total = s["hits"] + s["misses"]
+        if not total:
+            return "Embedding cache: no lookups."
+        return f"Embedding cache: {s['hits']}/{total} hits ({s['hits'] / total:.0%}), {s['evicted']} evicted"
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps a LangChain embeddings model; only texts missing from the cache reach the model."""
+
+    def __init__(self, embeddings, cache, model_name):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts):
+        keys = [cache_key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            # Identical texts inside the batch are embedded once
+            unique = {}
+            for i in missing:
+                unique.setdefault(keys[i], texts[i])
+            fresh = self.embeddings.embed_documents(list(unique.values()))
+            computed = dict(zip(unique, fresh))
+            self.cache.put_many(list(computed), list(computed.values()))
+            for i in missing:
+                vectors[i] = computed[keys[i]]
+        return vectors
+
+    def embed_query(self, text):
+        # Models may embed queries differently (instruction prefixes), so queries get their own key space
+        key = cache_key(f"{self.model_name}#query", text)
+        vector = self.cache.get_many([key])[0]
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put_many([key], [vector])
+        return vector
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(db_path="data/embedding_cache.db"):
+    """One EmbeddingCache (one SQLite connection) per database file per process."""
+    with _caches_lock:
+        if db_path not in _caches:
+            _caches[db_path] = EmbeddingCache(db_path)
+        return _caches[db_path]
@@ -0,0 +1,116 @@
+import os
+import time
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.embeddings import Embeddings
+
+# Spawned workers start clean (no parent torch/tokenizer threads) and load their own model
+_ctx = mp.get_context("spawn")
+
+# Per-worker model, built once by the initializer
+_model = None
+
+
+def _init_worker(model_name, backend, batch_size, threads):
+    global _model
+    # Must be set before torch/onnxruntime are imported in this process
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    from engine.model_registry import get_embedding_backend, get_tokenizer
+    from engine.batched_embeddings import BatchedEmbeddings
+
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    model = get_embedding_backend(backend, model_name, batch_size=batch_size)
+    _model = BatchedEmbeddings(model, tokenizer=get_tokenizer(model_name), batch_size=batch_size)
+
+
+def _embed_task(texts):
+    return _model.embed_documents(texts)
+
+
+def _query_task(text):
+    return _model.embed_query(text)
+
+
+class EmbeddingPool:
+    """
+    Embedding service for bulk ingestion: `num_workers` processes, each holding the model
+    and limited to `threads_per_worker` threads, fed chunk batches through the executor queue.
+
+    By default it takes the cores left after `reserve_cores` (kept for parsing/chunking).
+    """
+
+    def __init__(self, model_name, backend="torch", num_workers=None, threads_per_worker=2,
+                 reserve_cores=4, batch_size=64, texts_per_task=256):
+        if not num_workers:
+            num_workers = max(1, ((os.cpu_count() or 1) - reserve_cores) // threads_per_worker)
+        self.num_workers = num_workers
+        self.texts_per_task = texts_per_task
+        self.batch_size = batch_size
+        self.executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=_ctx,
+            initializer=_init_worker,
+            initargs=(model_name, backend, batch_size, threads_per_worker)
+        )
+        self._lock = threading.Lock()
+        self.stats = {"texts": 0, "tasks": 0, "seconds": 0.0}
+        print(f"🧮 Embedding pool: {num_workers} workers x {threads_per_worker} threads")
+
+    def embed(self, texts):
+        """Embeds texts across the workers; vectors come back in input order."""
+        if not texts:
+            return []
+        started = time.perf_counter()
+        # Similar lengths per task, so each worker's batches pad little
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        # A small call is still spread over every worker (down to one encode batch per task)
+        per_task = min(self.texts_per_task, max(self.batch_size, -(-len(texts) // self.num_workers)))
+        tasks = [order[start:start + per_task] for start in range(0, len(order), per_task)]
+        futures = [self.executor.submit(_embed_task, [texts[i] for i in task]) for task in tasks]
+
+        vectors = [None] * len(texts)
+        for task, future in zip(tasks, futures):
+            for i, vector in zip(task, future.result()):
+                vectors[i] = vector
+
+        with self._lock:
+            self.stats["texts"] += len(texts)
+            self.stats["tasks"] += len(tasks)
+            self.stats["seconds"] += time.perf_counter() - started
+        return vectors
+
+    def embed_query(self, text):
+        return self.executor.submit(_query_task, text).result()
+
+    def report(self):
+        s = self.stats
+        if not s["texts"] or not s["seconds"]:
+            return "Embedding pool: nothing embedded."
+        return (f"Embedding pool: {s['texts']} chunks in {s['seconds']:.1f}s "
+                f"({s['texts'] / s['seconds']:.1f} chunks/s across {self.num_workers} workers)")
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class PooledEmbeddings(Embeddings):
+    """LangChain Embeddings facade over an EmbeddingPool (what VectorEngine/Chroma call)."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def embed_documents(self, texts):
+        return self.pool.embed(list(texts))
+
+    def embed_query(self, text):
+        return self.pool.embed_query(text)
+
+    def report(self):
+        return self.pool.report()
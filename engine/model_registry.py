@@ -0,0 +1,85 @@
+import threading
+
+DEFAULT_EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+
+# Loaded models live for the whole process; every VectorEngine/RAGRetriever/chunker
+# gets a reference to the same instance instead of reading the weights from disk again.
+_models = {}
+_load_locks = {}
+_registry_lock = threading.Lock()
+
+# Fast tokenizers set their truncation/padding state on every call, so concurrent calls on
+# the shared instance fail with "Already borrowed" (or count with another call's settings).
+# Hold this around every use of a tokenizer from get_tokenizer().
+tokenizer_lock = threading.Lock()
+
+
+def _get_or_load(key, loader):
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+    # Per-model lock: two threads asking for the same model load it once,
+    # while a different model can load in parallel
+    with load_lock:
+        model = _models.get(key)
+        if model is None:
+            print(f"⏳ Loading {key[0]}: {key[1]}")
+            model = loader()
+            _models[key] = model
+    return model
+
+
+def get_embeddings(model_name=DEFAULT_EMBEDDING_MODEL, device="cpu", normalize_embeddings=False, batch_size=None):
+    """Shared HuggingFaceEmbeddings for (model, device, normalization, encode batch size)."""
+    def load():
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        encode_kwargs = {"normalize_embeddings": normalize_embeddings}
+        if batch_size:
+            encode_kwargs["batch_size"] = batch_size
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": device},
+            encode_kwargs=encode_kwargs
+        )
+
+    return _get_or_load(("embeddings", model_name, device, normalize_embeddings, batch_size), load)
+
+
+def get_onnx_embeddings(model_name=DEFAULT_EMBEDDING_MODEL, quantize=False):
+    """Shared ONNX Runtime backend (exports the graph on first use)."""
+    def load():
+        from engine.onnx_embeddings import OnnxEmbeddings
+
+        return OnnxEmbeddings(model_name, quantize=quantize)
+
+    return _get_or_load(("onnx", model_name, quantize), load)
+
+
+def get_embedding_backend(backend, model_name=DEFAULT_EMBEDDING_MODEL, batch_size=None):
+    """
+    backend: "torch" (sentence-transformers, default) | "onnx" | "onnx-int8".
+    All three return the same bge vectors up to numerical noise (see tests/onnx_parity_test.py).
+    """
+    if backend == "onnx":
+        return get_onnx_embeddings(model_name, quantize=False)
+    if backend == "onnx-int8":
+        return get_onnx_embeddings(model_name, quantize=True)
+    return get_embeddings(model_name, device="cpu", batch_size=batch_size) # Change device to 'cuda' if you have a GPU
+
+
+def get_tokenizer(model_name=DEFAULT_EMBEDDING_MODEL):
+    """Shared fast (Rust) tokenizer for a model; call it under `tokenizer_lock`."""
+    def load():
+        from transformers import AutoTokenizer
+
+        return AutoTokenizer.from_pretrained(model_name, use_fast=True)
+
+    return _get_or_load(("tokenizer", model_name), load)
+
+
+def loaded_models():
+    return [key for key in _models]
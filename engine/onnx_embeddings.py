@@ -0,0 +1,99 @@
+import re
+import threading
+from pathlib import Path
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def onnx_model_path(model_name, onnx_dir="data/onnx", quantize=False):
+    safe = re.sub(r"[^\w.-]", "_", model_name)
+    return Path(onnx_dir) / safe / ("model.int8.onnx" if quantize else "model.onnx")
+
+
+def export_onnx(model_name, onnx_dir="data/onnx", quantize=False):
+    """
+    Exports the transformer of `model_name` to ONNX (once) and optionally writes an int8
+    dynamically quantized copy next to it. Returns the path of the requested graph.
+    """
+    fp32_path = onnx_model_path(model_name, onnx_dir)
+    target = onnx_model_path(model_name, onnx_dir, quantize)
+    if target.exists():
+        return target
+
+    fp32_path.parent.mkdir(parents=True, exist_ok=True)
+    if not fp32_path.exists():
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        print(f"📦 Exporting {model_name} to ONNX")
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name)
+        model.eval()
+
+        sample = tokenizer(["export sample"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(sample[name] for name in input_names),
+                str(fp32_path),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=17,
+                dynamo=False
+            )
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        print(f"📦 Quantizing {model_name} to int8")
+        quantize_dynamic(str(fp32_path), str(target), weight_type=QuantType.QInt8)
+    return target
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    CPU embedding backend running the exported bge graph in ONNX Runtime.
+
+    Mirrors the sentence-transformers pipeline of bge models: CLS pooling followed by
+    L2 normalization. `quantize=True` uses the int8 dynamically quantized graph.
+    """
+
+    def __init__(self, model_name, quantize=False, onnx_dir="data/onnx", max_length=512, num_threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = export_onnx(model_name, onnx_dir, quantize)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        # Own tokenizer instance: its padding/truncation settings differ from the length-only
+        # calls on the shared one (model_registry.get_tokenizer), so the two never contend
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
+        self.max_length = max_length
+        # Still shared by every thread embedding through this backend
+        self._tokenizer_lock = threading.Lock()
+
+    def _embed(self, texts):
+        with self._tokenizer_lock:
+            encoded = self.tokenizer(
+                texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np", verbose=False
+            )
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+        hidden = self.session.run(["last_hidden_state"], feeds)[0]
+        cls = hidden[:, 0]
+        cls = cls / np.maximum(np.linalg.norm(cls, axis=1, keepdims=True), 1e-12)
+        return cls.tolist()
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts)) if texts else []
+
+    def embed_query(self, text):
+        return self._embed([text])[0]
@@ -0,0 +1,104 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+
+class ParentStore:
+    """
+    Keeps the large "parent" windows of hierarchical chunking outside the vector index.
+
+    Only the small child chunks are embedded; each child carries a `parent_id` and the
+    retriever swaps children for their parent text at query time. One SQLite file per case
+    under data/parents/, so lookups by id stay fast without loading anything into memory.
+    """
+
+    def __init__(self, case_id, db_dir="data/parents"):
+        self.db_path = Path(db_dir) / f"{case_id}.db"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS parents (
+                       parent_id TEXT PRIMARY KEY,
+                       source_file TEXT,
+                       text TEXT,
+                       metadata TEXT
+                   )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_parents_source ON parents(source_file)")
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def put_many(self, parents):
+        """Stores LangChain Documents that carry metadata["parent_id"]."""
+        rows = [
+            (
+                doc.metadata["parent_id"],
+                doc.metadata.get("source_file", "Unknown"),
+                doc.page_content,
+                json.dumps(doc.metadata),
+            )
+            for doc in parents
+        ]
+        with self._lock, self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO parents VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def get_many(self, parent_ids):
+        """Returns {parent_id: (text, metadata)} for the ids that exist."""
+        found = {}
+        ids = list(parent_ids)
+        with self._connect() as conn:
+            # Stay under SQLite's bound-variable limit
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT parent_id, text, metadata FROM parents WHERE parent_id IN ({placeholders})", batch
+                )
+                for parent_id, text, metadata in rows:
+                    found[parent_id] = (text, json.loads(metadata))
+        return found
+
+    def delete_file(self, source_file):
+        with self._lock, self._connect() as conn:
+            return conn.execute("DELETE FROM parents WHERE source_file = ?", (source_file,)).rowcount
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM parents")
+
+
+def expand_to_parents(case_id, results, max_chars=12000):
+    """
+    Small-to-big step shared by the retrievers: swaps ranked child chunks for the parent
+    windows they belong to (each parent once, in rank order) until max_chars.
+    Chunks without a parent_id (non-hierarchical collections) are used as-is.
+    Returns (context, sources).
+    """
+    parent_ids = [doc.metadata["parent_id"] for doc in results if doc.metadata.get("parent_id")]
+    parents = ParentStore(case_id).get_many(set(parent_ids)) if parent_ids else {}
+
+    blocks, sources, seen = [], [], set()
+    used = 0
+    for doc in results:
+        parent_id = doc.metadata.get("parent_id")
+        key = parent_id or doc.page_content
+        if key in seen:
+            continue
+        seen.add(key)
+
+        text = parents[parent_id][0] if parent_id in parents else doc.page_content
+        if used and used + len(text) > max_chars:
+            break
+        blocks.append(text)
+        used += len(text)
+        source = doc.metadata.get("source_file", "Unknown")
+        if source not in sources:
+            sources.append(source)
+
+    print(f"Retrieved {len(results)} child chunks -> {len(blocks)} parent windows ({used} chars)")
+    return "\n\n".join(blocks), sources
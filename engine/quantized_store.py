@@ -0,0 +1,234 @@
+import os
+import json
+import uuid
+import threading
+from pathlib import Path
+import numpy as np
+
+# Chunk IDs (sha1 hex, or LangChain uuid4 for collections written before deterministic IDs)
+ID_DTYPE = "S64"
+# Random token rewritten on every vector write to a quantized case (see mark_collection_changed)
+VERSION_FILE = "collection_version"
+
+
+def mark_collection_changed(case_id, store_dir="data/quantized"):
+    """
+    Called after chunks are upserted or deleted: the case's quantized copy (if any) no
+    longer matches the collection, even when the chunk count happens to be the same.
+    """
+    case_dir = Path(store_dir) / case_id
+    if not case_dir.is_dir():
+        return
+    tmp_path = case_dir / f"{VERSION_FILE}.{uuid.uuid4().hex}.tmp"
+    tmp_path.write_text(uuid.uuid4().hex, encoding="utf-8")
+    os.replace(tmp_path, case_dir / VERSION_FILE)
+
+
+class QuantizedStore:
+    """
+    Reduced-precision copy of a case's vectors for search: float16 (2 bytes/dim) or
+    int8 with a per-vector scale (1 byte/dim) instead of Chroma's float32 (4 bytes/dim).
+
+    Vectors live in NumPy memmaps under data/quantized/<case>/, so only the pages a
+    search touches are resident. Search is an exact scan over the quantized codes in
+    blocks; the best candidates can be re-ranked against the full float32 copy kept on
+    disk next to them. Chroma itself still stores (and can still search) float32.
+    """
+
+    def __init__(self, case_id, store_dir="data/quantized"):
+        self.case_id = case_id
+        self.dir = Path(store_dir) / case_id
+        self._lock = threading.Lock()
+        self.meta = None
+        self._mtime = None
+        self._load()
+
+    def _refresh(self):
+        """Reloads the memmaps if quantize_case.py rebuilt the store in another process."""
+        try:
+            mtime = (self.dir / "meta.json").stat().st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            with self._lock:
+                self._load()
+
+    def _load(self):
+        meta_path = self.dir / "meta.json"
+        if not meta_path.exists():
+            self.meta = None
+            self._mtime = None
+            return
+        self._mtime = meta_path.stat().st_mtime
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        count, dim = meta["count"], meta["dim"]
+        self.ids = np.memmap(self.dir / "ids.bin", dtype=ID_DTYPE, mode="r", shape=(count,))
+        self.codes = np.memmap(self.dir / "codes.bin", dtype=meta["dtype"], mode="r", shape=(count, dim))
+        self.scales = None
+        if meta["dtype"] == "int8":
+            self.scales = np.memmap(self.dir / "scales.bin", dtype=np.float32, mode="r", shape=(count,))
+        self.full = None
+        if meta.get("full"):
+            self.full = np.memmap(self.dir / "full.bin", dtype=np.float32, mode="r", shape=(count, dim))
+        self.meta = meta
+
+    def exists(self):
+        self._refresh()
+        return self.meta is not None
+
+    @property
+    def count(self):
+        return self.meta["count"] if self.meta else 0
+
+    def collection_version(self):
+        try:
+            return (self.dir / VERSION_FILE).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    def is_current(self, collection_count):
+        """True if no chunk was written or deleted since the store was built."""
+        if not self.exists():
+            return False
+        return self.count == collection_count and self.meta.get("version") == self.collection_version()
+
+    def resident_bytes(self):
+        """Bytes a full scan pages in (codes + scales); the float32 copy is only read for re-rank."""
+        if not self.meta:
+            return 0
+        per_vector = self.meta["dim"] * np.dtype(self.meta["dtype"]).itemsize
+        if self.meta["dtype"] == "int8":
+            per_vector += 4
+        return self.count * per_vector
+
+    def build(self, collection, dtype="int8", keep_full=True, page_size=5000):
+        """
+        (Re)builds the store from a Chroma collection, page by page. The new files are
+        written next to the old ones and swapped in at the end. Returns the vector count.
+        """
+        if dtype not in ("float16", "int8"):
+            raise ValueError(f"Unsupported dtype {dtype} (use float16 or int8)")
+        total = collection.count()
+        if not total:
+            return 0
+        first = collection.get(limit=1, include=["embeddings"])
+        dim = len(first["embeddings"][0])
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        # Read before scanning: a write during the build leaves the new store out of date
+        version = self.collection_version()
+        tmp = {name: self.dir / f"{name}.bin.tmp" for name in ("ids", "codes", "scales", "full")}
+        ids = np.memmap(tmp["ids"], dtype=ID_DTYPE, mode="w+", shape=(total,))
+        codes = np.memmap(tmp["codes"], dtype=dtype, mode="w+", shape=(total, dim))
+        scales = np.memmap(tmp["scales"], dtype=np.float32, mode="w+", shape=(total,)) if dtype == "int8" else None
+        full = np.memmap(tmp["full"], dtype=np.float32, mode="w+", shape=(total, dim)) if keep_full else None
+
+        written = 0
+        while written < total:
+            page = collection.get(include=["embeddings"], limit=min(page_size, total - written), offset=written)
+            if not len(page["ids"]):
+                break
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            # Normalized, so a dot product ranks like cosine (bge vectors already are)
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            end = written + len(vectors)
+
+            ids[written:end] = [doc_id.encode("utf-8") for doc_id in page["ids"]]
+            if dtype == "int8":
+                # Symmetric per-vector scale: the largest component maps to 127
+                scale = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+                codes[written:end] = np.round(vectors / scale[:, None]).astype(np.int8)
+                scales[written:end] = scale
+            else:
+                codes[written:end] = vectors.astype(np.float16)
+            if full is not None:
+                full[written:end] = vectors
+            written = end
+
+        for array_map in (ids, codes, scales, full):
+            if array_map is not None:
+                array_map.flush()
+        del ids, codes, scales, full
+
+        with self._lock:
+            for name, path in tmp.items():
+                if path.exists():
+                    os.replace(path, self.dir / f"{name}.bin")
+                else:
+                    # float16 has no scales, --no-full no float32 copy: don't leave the last build's behind
+                    (self.dir / f"{name}.bin").unlink(missing_ok=True)
+            meta = {"count": written, "dim": dim, "dtype": dtype, "full": keep_full, "version": version}
+            with open(self.dir / "meta.json.tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            os.replace(self.dir / "meta.json.tmp", self.dir / "meta.json")
+            self._load()
+        return written
+
+    def search(self, query_vector, k=8, rerank=True, candidates=None, block_size=16384):
+        """
+        [(doc_id, score)] best first for a query vector. With `rerank` (and a float32 copy
+        on disk) the top `candidates` (default 4*k) are re-scored at full precision.
+        """
+        self._refresh()
+        with self._lock:
+            # Consistent view even if a rebuild swaps the memmaps mid-search
+            meta, ids, codes, scales, full = self.meta, self.ids, self.codes, self.scales, self.full
+        if not meta or not meta["count"]:
+            return []
+        count = meta["count"]
+        query = np.asarray(query_vector, dtype=np.float32)
+        query /= max(float(np.linalg.norm(query)), 1e-12)
+        rerank = rerank and full is not None
+        keep = max(k, candidates or 4 * k) if rerank else k
+
+        best_idx, best_scores = [], []
+        for start in range(0, count, block_size):
+            block = np.asarray(codes[start:start + block_size], dtype=np.float32)
+            scores = block @ query
+            if scales is not None:
+                scores *= scales[start:start + block_size]
+            top = min(keep, len(scores))
+            idx = np.argpartition(-scores, top - 1)[:top]
+            best_idx.append(idx + start)
+            best_scores.append(scores[idx])
+
+        idx = np.concatenate(best_idx)
+        scores = np.concatenate(best_scores)
+        order = np.argsort(-scores)[:keep]
+        idx, scores = idx[order], scores[order]
+
+        if rerank:
+            # Sorted row order keeps the reads from the float32 file sequential
+            rows = np.sort(idx)
+            exact = dict(zip(rows.tolist(), (np.asarray(full[rows]) @ query).tolist()))
+            scores = np.array([exact[i] for i in idx.tolist()], dtype=np.float32)
+            order = np.argsort(-scores)
+            idx, scores = idx[order], scores[order]
+
+        return [(ids[i].decode("utf-8"), float(s)) for i, s in zip(idx[:k].tolist(), scores[:k].tolist())]
+
+    def delete(self):
+        with self._lock:
+            for path in self.dir.glob("*"):
+                path.unlink()
+            self.meta = None
+            self._mtime = None
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_quantized_store(case_id):
+    """One shared QuantizedStore (and its memmaps) per case."""
+    with _stores_lock:
+        if case_id not in _stores:
+            _stores[case_id] = QuantizedStore(case_id)
+        return _stores[case_id]
+
+
+def drop_quantized_store(case_id):
+    """Forgets a case's QuantizedStore when the case is unloaded (its memmaps go with it)."""
+    with _stores_lock:
+        _stores.pop(case_id, None)
@@ -1,19 +1,22 @@
-from langchain_chroma import Chroma
 from engine.vector_db import VectorEngine # Reuse your BGE setup
 
 class RAGRetriever:
     def __init__(self, collection_name):
         # Initialize your local BGE embeddings
-        self.engine = VectorEngine()
+        self.engine = VectorEngine(collection_name=collection_name)
+        self.collection_name = collection_name
         # Load the existing collection
-        self.vector_db = Chroma(
-            persist_directory=self.engine.persist_directory,
-            embedding_function=self.engine.embeddings,
-            collection_name=collection_name # Match your current name
-        )
+        self.vector_db = self.engine.vector_store()  # shared client for the data/chroma_db directory
 
     def get_relevant_context(self, query, k=4):
         # Search the DB for the most similar text chunks
         docs = self.vector_db.similarity_search(query, k=k)
         # Join the text into one big context block
-        return "\n\n---\n\n".join([doc.page_content for doc in docs])
\ No newline at end of file
+        return "\n\n---\n\n".join([doc.page_content for doc in docs])
+
+    def get_parent_context(self, query, k=20, max_chars=12000):
+        # Hierarchical collections: search the small child chunks, return their parent windows
+        from engine.parent_store import expand_to_parents
+
+        docs = self.vector_db.similarity_search(query, k=k)
+        return expand_to_parents(self.collection_name, docs, max_chars=max_chars)
@@ -1,25 +1,82 @@
-from langchain_chroma import Chroma
 from engine.vector_db import VectorEngine
+from engine.time_index import get_time_index, parse_time_query
 
 class RAGRetriever:
     def __init__(self, collection_name="default"):
-        self.engine = VectorEngine()
+        self.engine = VectorEngine(collection_name=collection_name)
         self.collection_name = collection_name
         
         # Connect to the SPECIFIC collection for this case
-        self.vector_db = Chroma(
-            persist_directory=self.engine.persist_directory,
-            embedding_function=self.engine.embeddings,
-            collection_name=self.collection_name
-        )
+        self.vector_db = self.engine.vector_store()  # shared client for the data/chroma_db directory
+
+    def _search(self, query, k):
+        """Ranked chunks for a query (dense similarity; retriever6 fuses in BM25)."""
+        return self.vector_db.similarity_search(query, k=k)
 
     def get_relevant_context(self, query, k=8):
-        results = self.vector_db.similarity_search(query, k=k)
+        results = self._search(query, k=k)
         print("retirved chunks:",results,"\n\n")
         context = "\n\n".join([doc.page_content for doc in results])
         sources = list(set([doc.metadata.get("source_file", "Unknown") for doc in results]))
+
+        # Time questions about media ("what happens around minute 42") also get the
+        # windows at that time from the interval index, ahead of the search results
+        timed = self.get_time_context(query)
+        if timed:
+            timed_context, timed_sources = timed
+            context = timed_context + ("\n\n" + context if context else "")
+            sources = timed_sources + [s for s in sources if s not in timed_sources]
         return context, sources
 
+    def get_time_context(self, query, source_file=None, neighbors=1):
+        """
+        Answers a time question from the media interval index instead of vector search:
+        the window covering the requested second plus `neighbors` windows on each side,
+        for the media file named in the query (or every media file in the case).
+        Returns None when the case has no timed media covering that time.
+        """
+        time_index = get_time_index(self.collection_name)
+        media_files = time_index.media_files()
+        if not media_files:
+            return None
+        seconds = parse_time_query(query, media_files)
+        if seconds is None:
+            return None
+
+        if source_file:
+            targets = [source_file]
+        else:
+            mentioned = [f for f in media_files if f.lower() in query.lower()]
+            targets = mentioned or media_files
+
+        blocks, sources = [], []
+        for name in targets:
+            if seconds > time_index.duration(name):
+                continue
+            windows = time_index.lookup(name, seconds, neighbors=neighbors)
+            results = self.vector_db.get(
+                where={"$and": [{"source_file": name}, {"window_index": {"$in": windows}}]}
+            )
+            ordered = sorted(zip(results["documents"], results["metadatas"]), key=lambda r: r[1].get("start_sec", 0))
+            if ordered:
+                blocks.append(f"--- Source: {name} ---\n" + "\n\n".join(text for text, _meta in ordered))
+                sources.append(name)
+
+        if not blocks:
+            return None
+        print(f"Time lookup at {seconds:.0f}s -> {len(sources)} media file(s)")
+        return "\n\n".join(blocks), sources
+
+    def get_parent_context(self, query, k=20, max_chars=12000):
+        """
+        Small-to-big retrieval: searches the embedded child chunks, then returns the
+        parent windows they belong to (each parent once, in rank order) until max_chars.
+        Chunks without a parent_id (non-hierarchical collections) are used as-is.
+        """
+        from engine.parent_store import expand_to_parents
+
+        return expand_to_parents(self.collection_name, self._search(query, k=k), max_chars=max_chars)
+
     def get_chunks(self, filename: str):
         """
         Retrieves all document chunks associated with a specific filename 
@@ -1,17 +1,12 @@
-from langchain_chroma import Chroma
 from engine.vector_db import VectorEngine
 
 class RAGRetriever:
     def __init__(self, collection_name="default"):
-        self.engine = VectorEngine()
+        self.engine = VectorEngine(collection_name=collection_name)
         self.collection_name = collection_name
         
         # Connect to the SPECIFIC collection for this case
-        self.vector_db = Chroma(
-            persist_directory=self.engine.persist_directory,
-            embedding_function=self.engine.embeddings,
-            collection_name=self.collection_name
-        )
+        self.vector_db = self.engine.vector_store()  # shared client for the data/chroma_db directory
 
     def get_relevant_context(self, query, k=8):
     # MMR search for better diversity in context
@@ -27,4 +22,11 @@ class RAGRetriever:
         
         context = "\n\n".join([doc.page_content for doc in results])
         sources = list(set([doc.metadata.get("source_file", "Unknown") for doc in results]))
-        return context, sources
\ No newline at end of file
+        return context, sources
+
+    def get_parent_context(self, query, k=20, max_chars=12000):
+        # Hierarchical collections: search the small child chunks, return their parent windows
+        from engine.parent_store import expand_to_parents
+
+        docs = self.vector_db.similarity_search(query, k=k)
+        return expand_to_parents(self.collection_name, docs, max_chars=max_chars)
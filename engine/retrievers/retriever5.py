@@ -1,21 +1,16 @@
 import os
 import numpy as np
-from langchain_chroma import Chroma
 from langchain_openai import ChatOpenAI
 from langchain.retrievers.multi_query import MultiQueryRetriever
 from engine.vector_db import VectorEngine
 
 class RAGRetriever:
     def __init__(self, collection_name="default"):
-        self.engine = VectorEngine()
+        self.engine = VectorEngine(collection_name=collection_name)
         self.collection_name = collection_name
         
         # Initialize Vector DB
-        self.vector_db = Chroma(
-            persist_directory=self.engine.persist_directory,
-            embedding_function=self.engine.embeddings,
-            collection_name=self.collection_name
-        )
+        self.vector_db = self.engine.vector_store()  # shared client for the data/chroma_db directory
 
         # Initialize LLM for Multi-Query expansion
         self.llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
@@ -72,4 +67,12 @@ class RAGRetriever:
         sources = list(set([doc.metadata.get("source_file", "Unknown") for doc in results]))
         
         print(f"Retrieved {len(results)} chunks from {len(sources)} sources.")
-        return context, sources
\ No newline at end of file
+        return context, sources
+
+    def get_parent_context(self, query, k=20, max_chars=12000, source_file=None):
+        # Hierarchical collections: search the small child chunks, return their parent windows
+        from engine.parent_store import expand_to_parents
+
+        search_filter = {"source_file": source_file} if source_file else None
+        docs = self.vector_db.similarity_search(query, k=k, filter=search_filter)
+        return expand_to_parents(self.collection_name, docs, max_chars=max_chars)
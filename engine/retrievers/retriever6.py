@@ -0,0 +1,87 @@
+from langchain_core.documents import Document
+from engine.retrievers.retriever2 import RAGRetriever as DenseRetriever
+from engine.sparse_index import get_sparse_index
+from engine.quantized_store import get_quantized_store
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=60):
+    """Merges ranked ID lists: score(id) = sum of 1 / (rrf_k + rank) over the lists it is in."""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class RAGRetriever(DenseRetriever):
+    """
+    Hybrid retrieval: Chroma similarity + the case's BM25 sparse index, merged with
+    reciprocal rank fusion. Exact identifiers (UPI IDs, phone numbers, case numbers,
+    names) come back from the sparse side without keyword triggers or LLM multi-query.
+
+    With quantized=True the dense side searches the case's float16/int8 QuantizedStore
+    (built by quantize_case.py) instead of Chroma's float32 HNSW index.
+    """
+
+    def __init__(self, collection_name="default", fetch_k=30, rrf_k=60, quantized=False, rerank=True):
+        super().__init__(collection_name=collection_name)
+        self.fetch_k = fetch_k
+        self.rrf_k = rrf_k
+        self.rerank = rerank
+        self.quantized_store = None
+        if quantized:
+            store = get_quantized_store(collection_name)
+            if store.exists():
+                self.quantized_store = store
+                if not store.is_current(self.vector_db._collection.count()):
+                    print(f"⚠️ Quantized vectors of {collection_name} are out of date, "
+                          f"searching Chroma until quantize_case.py is re-run")
+            else:
+                print(f"⚠️ No quantized vectors for {collection_name}, searching Chroma")
+        self.sparse_index = get_sparse_index(collection_name)
+        # Chunks stored before the sparse index existed are indexed once, on first use
+        # (also when new files were ingested into the old collection in the meantime)
+        if not self.sparse_index.is_backfilled():
+            collection = self.vector_db._collection
+            if self.sparse_index.count() < collection.count():
+                print(f"⏳ Building sparse index for {collection_name} ({collection.count()} chunks)")
+                self.sparse_index.backfill(collection)
+            else:
+                self.sparse_index.mark_backfilled()
+
+    def _dense_search(self, query, k):
+        store = self.quantized_store
+        # Chunks written or deleted after quantize_case.py ran: search Chroma until it is rebuilt
+        if store is None or not store.is_current(self.vector_db._collection.count()):
+            return self.vector_db.similarity_search(query, k=k)
+        hits = store.search(self.engine.embeddings.embed_query(query), k=k, rerank=self.rerank)
+        ids = [doc_id for doc_id, _score in hits]
+        if not ids:
+            return []
+        rows = self.vector_db.get(ids=ids, include=["documents", "metadatas"])
+        found = {doc_id: Document(id=doc_id, page_content=text, metadata=meta or {})
+                 for doc_id, text, meta in zip(rows["ids"], rows["documents"], rows["metadatas"])}
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def _search(self, query, k):
+        fetch_k = max(k, self.fetch_k)
+        dense = self._dense_search(query, fetch_k)
+        sparse = self.sparse_index.search(query, k=fetch_k)
+
+        by_id = {doc.id: doc for doc in dense if doc.id}
+        dense_ids = [doc.id for doc in dense if doc.id]
+        sparse_ids = [doc_id for doc_id, _score in sparse]
+        fused = reciprocal_rank_fusion([dense_ids, sparse_ids], rrf_k=self.rrf_k)[:k]
+
+        # Sparse-only hits are fetched from Chroma (the sparse index keeps no text)
+        missing = [doc_id for doc_id in fused if doc_id not in by_id]
+        if missing:
+            rows = self.vector_db.get(ids=missing, include=["documents", "metadatas"])
+            for doc_id, text, meta in zip(rows["ids"], rows["documents"], rows["metadatas"]):
+                by_id[doc_id] = Document(id=doc_id, page_content=text, metadata=meta or {})
+
+        results = [by_id[doc_id] for doc_id in fused if doc_id in by_id]
+        sparse_only = len(set(sparse_ids[:k]) - set(dense_ids))
+        print(f"Hybrid search: {len(dense_ids)} dense + {len(sparse_ids)} BM25 -> {len(results)} fused "
+              f"({sparse_only} exact-match hits the dense search missed)")
+        return results
@@ -0,0 +1,195 @@
+import re
+import sqlite3
+import threading
+from pathlib import Path
+
+# Emails / UPI IDs (name@bank), case & invoice numbers (INV-2023-0457, CR/12/2023), dotted IDs
+_IDENTIFIER = re.compile(r"[\w+]+(?:[@./:_-][\w+]+)+")
+# Phone numbers and other long digit runs written with spaces/dashes/brackets
+_DIGIT_RUN = re.compile(r"\+?\(?\d[\d\s().-]{5,}\d")
+_WORD = re.compile(r"\w+")
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "do", "does", "for", "from", "had", "has",
+    "have", "he", "her", "his", "how", "i", "in", "is", "it", "its", "me", "of", "on", "or", "she",
+    "that", "the", "their", "there", "they", "this", "to", "was", "we", "were", "what", "when",
+    "where", "which", "who", "why", "with", "you", "all", "any", "about", "tell", "show", "list",
+}
+
+
+def tokenize(text):
+    """
+    Words plus whole identifiers: "ravi.k@okaxis" is indexed as one token (and as its parts),
+    "+91 98765-43210" also as the digit strings "919876543210" and "9876543210".
+    """
+    text = text.lower()
+    tokens = _WORD.findall(text)
+    tokens.extend(m.strip("._-/:") for m in _IDENTIFIER.findall(text))
+    for match in _DIGIT_RUN.findall(text):
+        digits = re.sub(r"\D", "", match)
+        if len(digits) >= 7:
+            tokens.append(digits)
+            if len(digits) > 10:
+                # National number without the country code / trunk prefix: "+91 98765-43210" -> "9876543210"
+                tokens.append(digits[-10:])
+    return [t for t in tokens if t]
+
+
+class SparseIndex:
+    """
+    Persistent BM25 inverted index for one collection (SQLite FTS5), kept next to Chroma.
+
+    Rows are keyed by the Chroma chunk ID, so the same upserts/deletes that change the
+    collection change this index. Exact-match terms (UPI IDs, phone numbers, case
+    numbers, names) that the dense model blurs are found here.
+    """
+
+    def __init__(self, case_id, index_dir="data/sparse"):
+        self.case_id = case_id
+        self.db_path = Path(index_dir) / f"{case_id}.db"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS docs (
+                   rowid INTEGER PRIMARY KEY,
+                   doc_id TEXT UNIQUE NOT NULL,
+                   source_file TEXT
+               )"""
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_source ON docs(source_file)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+        # Tokens are produced by tokenize() and space-joined; tokenchars keeps identifiers whole
+        self.conn.execute(
+            """CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5(
+                   tokens, tokenize="unicode61 remove_diacritics 2 tokenchars '@._-/:+'"
+               )"""
+        )
+        self.conn.commit()
+
+    def add(self, ids, texts, metadatas):
+        """Indexes (or re-indexes) chunks by their Chroma IDs."""
+        with self._lock:
+            rows = self._rowids(ids)
+            stale = [rows[doc_id] for doc_id in ids if doc_id in rows]
+            self._delete_rows(stale)
+            for doc_id, text, meta in zip(ids, texts, metadatas):
+                cursor = self.conn.execute(
+                    "INSERT INTO docs (doc_id, source_file) VALUES (?, ?)",
+                    (doc_id, (meta or {}).get("source_file", "Unknown"))
+                )
+                self.conn.execute("INSERT INTO terms (rowid, tokens) VALUES (?, ?)",
+                                  (cursor.lastrowid, " ".join(tokenize(text))))
+            self.conn.commit()
+
+    def _rowids(self, ids):
+        found = {}
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            placeholders = ",".join("?" * len(batch))
+            for rowid, doc_id in self.conn.execute(
+                f"SELECT rowid, doc_id FROM docs WHERE doc_id IN ({placeholders})", batch
+            ):
+                found[doc_id] = rowid
+        return found
+
+    def _delete_rows(self, rowids):
+        for start in range(0, len(rowids), 500):
+            batch = rowids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            self.conn.execute(f"DELETE FROM terms WHERE rowid IN ({placeholders})", batch)
+            self.conn.execute(f"DELETE FROM docs WHERE rowid IN ({placeholders})", batch)
+
+    def delete(self, ids):
+        with self._lock:
+            self._delete_rows(list(self._rowids(ids).values()))
+            self.conn.commit()
+
+    def delete_file(self, source_file):
+        with self._lock:
+            rowids = [r[0] for r in self.conn.execute("SELECT rowid FROM docs WHERE source_file = ?", (source_file,))]
+            self._delete_rows(rowids)
+            self.conn.commit()
+            return len(rowids)
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM terms")
+            self.conn.execute("DELETE FROM docs")
+            self.conn.execute("DELETE FROM state")
+            self.conn.commit()
+
+    def is_backfilled(self):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM state WHERE key = 'backfilled'").fetchone() is not None
+
+    def mark_backfilled(self):
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('backfilled', '1')")
+            self.conn.commit()
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def search(self, query, k=30, source_file=None):
+        """[(doc_id, bm25 score)] best first; higher score = better match."""
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t not in _STOPWORDS]
+        if not terms:
+            return []
+        match = " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+        sql = ("SELECT docs.doc_id, bm25(terms) FROM terms JOIN docs ON docs.rowid = terms.rowid "
+               "WHERE terms MATCH ?")
+        params = [match]
+        if source_file:
+            sql += " AND docs.source_file = ?"
+            params.append(source_file)
+        sql += " ORDER BY bm25(terms) LIMIT ?"
+        params.append(k)
+        with self._lock:
+            # FTS5's bm25() is lower-is-better; flip it
+            return [(doc_id, -score) for doc_id, score in self.conn.execute(sql, params)]
+
+    def backfill(self, collection, page_size=1000):
+        """
+        Indexes the chunks of a Chroma collection that are not in the index yet (collections
+        built before this index existed), then marks the index as complete. Returns how many.
+        """
+        offset = added = 0
+        while True:
+            page = collection.get(include=[], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+            with self._lock:
+                known = self._rowids(page["ids"])
+            missing = [doc_id for doc_id in page["ids"] if doc_id not in known]
+            if missing:
+                rows = collection.get(ids=missing, include=["documents", "metadatas"])
+                self.add(rows["ids"], rows["documents"], rows["metadatas"])
+                added += len(rows["ids"])
+        self.mark_backfilled()
+        return added
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_sparse_index(case_id):
+    """One shared SparseIndex (and SQLite connection) per case."""
+    with _indexes_lock:
+        if case_id not in _indexes:
+            _indexes[case_id] = SparseIndex(case_id)
+        return _indexes[case_id]
+
+
+def drop_sparse_index(case_id):
+    """
+    Forgets a case's SparseIndex when the case is unloaded. Not closed here: an ingest
+    still holding it keeps working, and the connection closes once the last user lets go.
+    """
+    with _indexes_lock:
+        _indexes.pop(case_id, None)
@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import bisect
+import threading
+from pathlib import Path
+
+
+class TimeIndex:
+    """
+    Per-case interval index over media chunks: source_file -> sorted [start_sec, end_sec]
+    per window_index. Answers "what is at minute 42 of X" with a bisect instead of a
+    vector search; the matching chunks are then fetched from Chroma by window_index.
+    """
+
+    def __init__(self, case_id, index_dir="data/time_index"):
+        self.case_id = case_id
+        self.index_path = Path(index_dir) / f"{case_id}.json"
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self.files = {}
+        self._refresh()
+
+    def _refresh(self):
+        """Reloads the index if another process (e.g. main2 ingestion) rewrote it."""
+        try:
+            mtime = self.index_path.stat().st_mtime
+        except FileNotFoundError:
+            return
+        if mtime != self._mtime:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.files = json.load(f)
+            self._mtime = mtime
+
+    def _save(self):
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.files, f)
+        os.replace(tmp_path, self.index_path)
+        self._mtime = self.index_path.stat().st_mtime
+
+    def record(self, source_file, chunks):
+        """Stores the intervals of a file's media_window chunks (replacing older ones)."""
+        intervals = sorted(
+            [c.metadata["start_sec"], c.metadata["end_sec"], c.metadata["window_index"]]
+            for c in chunks if "window_index" in c.metadata
+        )
+        with self._lock:
+            self._refresh()
+            self.files[source_file] = intervals
+            self._save()
+
+    def forget(self, source_file):
+        with self._lock:
+            self._refresh()
+            if self.files.pop(source_file, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self.files = {}
+            self._save()
+
+    def lookup(self, source_file, seconds, neighbors=1):
+        """window_index values covering `seconds` (or the nearest window) plus `neighbors` on each side."""
+        self._refresh()
+        intervals = self.files.get(source_file)
+        if not intervals:
+            return []
+        starts = [interval[0] for interval in intervals]
+        # Last window starting at or before `seconds`
+        position = max(bisect.bisect_right(starts, seconds) - 1, 0)
+        low = max(position - neighbors, 0)
+        high = min(position + neighbors + 1, len(intervals))
+        return [intervals[i][2] for i in range(low, high)]
+
+    def media_files(self):
+        self._refresh()
+        return list(self.files)
+
+    def duration(self, source_file):
+        intervals = self.files.get(source_file)
+        return intervals[-1][1] if intervals else 0
+
+
+# "01:02:03", "42:10"
+_CLOCK = re.compile(r'\b(\d{1,2}):(\d{2})(?::(\d{2}))?\b')
+# "42 minutes", "90 secs", "1 hour 5 min" (no bare h/m/s: "500 m", "the 1990s")
+_AMOUNT_UNIT = re.compile(r'(\d+(?:\.\d+)?)\s*(hours?|hrs?|minutes?|mins?|seconds?|secs?)\b', re.IGNORECASE)
+# "minute 42", "hour 1"
+_UNIT_AMOUNT = re.compile(r'\b(hour|minute|min|second|sec)s?\s+(\d+(?:\.\d+)?)\b', re.IGNORECASE)
+_UNIT_SECONDS = {"h": 3600, "m": 60, "s": 1}
+# Phrasing that makes a clock time / duration a position in a recording: a media noun or
+# "the 42 minute mark" (not a bare "into"/"mark": "money into the account", "mark-up")
+_MEDIA_CONTEXT = re.compile(
+    r'\b(video|audio|recording|clip|footage|tape|transcript|voicemail|timestamp)s?\b'
+    r'|\b(?:hour|minute|min|second|sec)s?\s+mark\b',
+    re.IGNORECASE
+)
+
+
+def _mentions_media(query, media_files):
+    lowered = query.lower()
+    if _MEDIA_CONTEXT.search(query):
+        return True
+    return any(name.lower() in lowered or Path(name).stem.lower() in lowered for name in media_files)
+
+
+def parse_time_query(query, media_files=()):
+    """
+    Seconds referred to by a question about a position in a recording (None otherwise).
+
+    A clock time ("at 00:42:10"), a duration ("2 minutes 30 seconds in") or "minute 42"
+    only counts with media phrasing ("in the video", "into the recording", "the 42
+    minute mark") or the name of one of `media_files`, so "meeting at 10:30 with Kent",
+    "transferred money into the account at 10:30" or "paid in the first hour 2 days
+    later" are not time lookups.
+    """
+    if not _mentions_media(query, media_files):
+        return None
+
+    amounts = _AMOUNT_UNIT.findall(query)
+    match = _UNIT_AMOUNT.search(query)
+    # "2 minutes 30 seconds" is amount+unit, not "minute 30"
+    if match and not amounts and match.group(1).lower() in ("hour", "minute", "min"):
+        return float(match.group(2)) * _UNIT_SECONDS[match.group(1)[0].lower()]
+
+    clock = _CLOCK.search(query)
+    if clock:
+        first, second, third = clock.groups()
+        if third is not None:
+            return int(first) * 3600 + int(second) * 60 + int(third)
+        return int(first) * 60 + int(second)
+
+    if amounts:
+        return sum(float(value) * _UNIT_SECONDS[unit[0].lower()] for value, unit in amounts)
+
+    if match:
+        return float(match.group(2)) * _UNIT_SECONDS[match.group(1)[0].lower()]
+    return None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_time_index(case_id):
+    """One shared TimeIndex per case (same pattern as chunk manifests)."""
+    with _indexes_lock:
+        if case_id not in _indexes:
+            _indexes[case_id] = TimeIndex(case_id)
+        return _indexes[case_id]
+
+
+def drop_time_index(case_id):
+    """Forgets a case's TimeIndex when the case is unloaded (reloaded from disk on next use)."""
+    with _indexes_lock:
+        _indexes.pop(case_id, None)
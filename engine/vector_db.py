@@ -1,36 +1,508 @@
 import os
-from langchain_huggingface import HuggingFaceEmbeddings
+import json
+import threading
 # from langchain_community.vectorstores import Chroma
 import chromadb
+from chromadb.errors import NotFoundError
 from langchain_chroma import Chroma
+from engine.dedup import ChunkDeduplicator
+from engine.model_registry import get_embedding_backend, get_tokenizer, DEFAULT_EMBEDDING_MODEL
+from engine.batched_embeddings import BatchedEmbeddings
+from engine.embedding_pool import PooledEmbeddings
+from engine.embedding_cache import CachedEmbeddings, get_embedding_cache
+from engine.chunkers.chunk_batch import ChunkBatch
+from engine.chroma_pool import get_client, get_write_lock, get_collection_lock, chunk_id
+from engine.sparse_index import get_sparse_index
+from engine.quantized_store import get_quantized_store, mark_collection_changed
 
 chromadb.api.client.SharedSystemClient.clear_system_cache()
 
 
 class VectorEngine:
-    def __init__(self, collection_name="intel_docs"):
-        # This model is free, runs locally, and is very fast
-        model_name = "BAAI/bge-small-en-v1.5"
-        model_kwargs = {'device': 'cpu'} # Change to 'cuda' if you have a GPU
-        encode_kwargs = {'normalize_embeddings': False}
-        
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=model_name,
-            model_kwargs=model_kwargs,
-            encode_kwargs=encode_kwargs
-        )
+    def __init__(self, collection_name="intel_docs", dedup_chunks=True, model_name=DEFAULT_EMBEDDING_MODEL,
+                 use_cache=True, backend=None, embedding_pool=None, sparse_index=True, dedup_max_hamming=None):
+        # This model is free, runs locally, and is very fast.
+        # Loaded once per process by the registry; every engine shares the same instance.
+        self.model_name = model_name
+        # EMBEDDING_BACKEND: torch (default) | onnx | onnx-int8 (ONNX Runtime, faster on CPU)
+        self.backend = backend or os.getenv("EMBEDDING_BACKEND", "torch")
+        # EMBED_BATCH_SIZE: texts per forward pass (tune per host; larger helps on many-core CPUs)
+        batch_size = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+        if embedding_pool is not None:
+            # Bulk ingestion: worker processes hold the model, nothing is loaded here
+            self.batcher = PooledEmbeddings(embedding_pool)
+        else:
+            model = get_embedding_backend(self.backend, model_name, batch_size=batch_size)
+            # Chunks are embedded sorted by token length so batches carry little padding
+            self.batcher = BatchedEmbeddings(model, tokenizer=get_tokenizer(model_name), batch_size=batch_size)
+        self.embeddings = self.batcher
+        if use_cache:
+            # Identical chunk text (re-ingests, rebuilds, the same attachment in several cases) is embedded once.
+            # Keyed per backend: int8 vectors are close to, but not the same as, the float ones.
+            self.embeddings = CachedEmbeddings(self.embeddings, get_embedding_cache(), f"{model_name}@{self.backend}")
         self.persist_directory = "./data/chroma_db"
         self.collection_name  = collection_name
+        # CHROMA_UPSERT_BATCH: chunks per upsert call
+        self.upsert_batch_size = int(os.getenv("CHROMA_UPSERT_BATCH", "512"))
+        self._store = None
+        # BM25 index of the same chunks (engine/sparse_index.py), for exact identifier matches
+        self.use_sparse_index = sparse_index
 
-    def store_documents(self, chunks):
-        try:
-            vector_db = Chroma.from_documents(
-                documents=chunks,
-                embedding=self.embeddings,
-                persist_directory=self.persist_directory,
+        # Repeated headers/footers/disclaimers are stored once with a list of occurrences.
+        # CHUNK_DEDUP_MAX_HAMMING: also fold near-identical chunks within that many SimHash bits (off by default)
+        if dedup_max_hamming is None and os.getenv("CHUNK_DEDUP_MAX_HAMMING"):
+            dedup_max_hamming = int(os.getenv("CHUNK_DEDUP_MAX_HAMMING"))
+        self.chunk_deduplicator = ChunkDeduplicator(max_hamming=dedup_max_hamming) if dedup_chunks else None
+        # Shared by every engine on this collection, so concurrent requests dedup against each other
+        self._dedup_lock = get_collection_lock(self.persist_directory, collection_name)
+        self._write_lock = get_write_lock(self.persist_directory)
+
+        # Files being re-indexed (begin_replace/finish_replace): source_file -> (old IDs, IDs written so far)
+        self._replacing = {}
+        # Old chunks of a re-indexed file that a near-identical new chunk took over
+        self._absorbed = set()
+        self._replace_lock = threading.Lock()
+
+    def vector_store(self):
+        """LangChain Chroma for this collection on the process-wide client."""
+        if self._store is None:
+            self._store = Chroma(
+                client=get_client(self.persist_directory),
+                embedding_function=self.embeddings,
                 collection_name=self.collection_name
             )
+        return self._store
+
+    def _open_store(self):
+        return self.vector_store()
+
+    def _embed_by_id(self, chunks):
+        """{chunk ID: vector} for chunks, embedded in one call (no lock held)."""
+        texts = {}
+        for chunk in chunks:
+            doc_id = chunk_id(self.collection_name, chunk.metadata.get("source_file", "Unknown"),
+                              chunk.page_content, chunk.metadata.get("parent_id"))
+            texts[doc_id] = chunk.page_content
+        return dict(zip(texts, self.embeddings.embed_documents(list(texts.values()))))
+
+    def _fold_into_stored(self, collection, kept, exclude_file=None):
+        """
+        Adds chunks that duplicate a stored chunk to its occurrences and returns the rest.
+        Stored chunks of `exclude_file` are not candidates (rechunk handles those itself).
+        """
+        existing = collection.get(where=self.chunk_deduplicator.existing_where(kept), include=["metadatas"])
+        candidates = [(doc_id, meta) for doc_id, meta in zip(existing["ids"], existing["metadatas"])
+                      if exclude_file is None or meta.get("source_file") != exclude_file]
+        if not candidates:
+            return kept
+
+        stored = self.chunk_deduplicator.index_stored(*zip(*candidates))
+        new_chunks, updated = [], {}
+        for chunk in kept:
+            match = self.chunk_deduplicator.find_match(stored, chunk.metadata)
+            if match is None:
+                new_chunks.append(chunk)
+                continue
+            doc_id, meta = match
+            source_file = chunk.metadata.get("source_file", "Unknown")
+            own_id = chunk_id(self.collection_name, source_file, chunk.page_content, chunk.metadata.get("parent_id"))
+            replacing = self._replacing.get(source_file)
+            if doc_id == own_id or (replacing is not None and doc_id in replacing[0]):
+                # Same file ingested again: overwrite it, keeping what other files folded into it.
+                # An old near-identical chunk of a file being replaced is deleted, not re-homed.
+                if doc_id != own_id:
+                    with self._replace_lock:
+                        self._absorbed.add(doc_id)
+                others = [label for label in json.loads(meta.get("occurrences", "[]"))
+                          if label.split("#p")[0] != source_file]
+                if others:
+                    own = json.loads(chunk.metadata["occurrences"])
+                    chunk.metadata["occurrences"] = json.dumps(sorted(set(own + others)))
+                    chunk.metadata["occurrence_count"] += len(others)
+                new_chunks.append(chunk)
+                continue
+            self.chunk_deduplicator.add_occurrence(meta, chunk.metadata)
+            updated[doc_id] = meta
+
+        if updated:
+            with self._write_lock:
+                collection.update(ids=list(updated), metadatas=list(updated.values()))
+        return new_chunks
+
+    def _upsert(self, collection, texts, metadatas, embeddings=None):
+        """Batched idempotent write with deterministic IDs; embeds outside the write lock."""
+        for start in range(0, len(texts), self.upsert_batch_size):
+            batch = {}
+            for text, meta in zip(texts[start:start + self.upsert_batch_size],
+                                  metadatas[start:start + self.upsert_batch_size]):
+                # Same text twice in a file -> same ID; keep one (Chroma rejects duplicate IDs per call)
+                batch[chunk_id(self.collection_name, meta.get("source_file", "Unknown"), text, meta.get("parent_id"))] = (text, meta)
+            ids = list(batch)
+            batch_texts = [batch[i][0] for i in ids]
+            if self._replacing:
+                with self._replace_lock:
+                    for doc_id in ids:
+                        replacing = self._replacing.get(batch[doc_id][1].get("source_file", "Unknown"))
+                        if replacing is not None:
+                            replacing[1].add(doc_id)
+            if embeddings is None:
+                vectors = self.embeddings.embed_documents(batch_texts)
+            else:
+                vectors = [embeddings[i] for i in ids]
+            with self._write_lock:
+                collection.upsert(
+                    ids=ids,
+                    embeddings=vectors,
+                    documents=batch_texts,
+                    metadatas=[batch[i][1] for i in ids]
+                )
+            mark_collection_changed(self.collection_name)
+            if self.use_sparse_index:
+                get_sparse_index(self.collection_name).add(ids, batch_texts, [batch[i][1] for i in ids])
+
+    def _add(self, vector_db, chunks):
+        if isinstance(chunks, ChunkBatch):
+            # Columnar batch: texts/metadatas go straight to Chroma, no Document objects
+            self._upsert(vector_db._collection, chunks.texts(), chunks.metadatas())
+        else:
+            self._upsert(vector_db._collection, [c.page_content for c in chunks], [c.metadata for c in chunks])
+
+    def store_documents(self, chunks):
+        """Stores LangChain Documents or a ChunkBatch."""
+        try:
+            vector_db = self._open_store()
+            if self.chunk_deduplicator is None:
+                if len(chunks):
+                    self._add(vector_db, chunks)
+                return vector_db
+            before = len(chunks)
+            # A ChunkBatch is collapsed on its columns; only the kept chunks become ChunkRecords
+            chunks = self.chunk_deduplicator.collapse(chunks)
+            # Embedded before taking the collection lock, so files of one case embed in parallel;
+            # a chunk that then folds into a stored one only wasted a (cached) vector
+            vectors = self._embed_by_id(chunks) if chunks else {}
+
+            # Fold + upsert serialized so two threads storing the same boilerplate don't both insert it
+            with self._dedup_lock:
+                if chunks:
+                    chunks = self._fold_into_stored(vector_db._collection, chunks)
+                if chunks:
+                    self._upsert(vector_db._collection, [c.page_content for c in chunks],
+                                 [c.metadata for c in chunks], embeddings=vectors)
+            if before != len(chunks):
+                print(f"♻️ Chunk dedup: stored {len(chunks)} of {before} chunks")
             return vector_db
         except Exception as e:
             print(f"❌ Error indexing to Chroma: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def rechunk_source_file(self, source_file, chunks, batch_size=256):
+        """
+        Replaces the chunks of one file with a new chunking of it, re-embedding only
+        texts that are not already stored for that file. Returns (reused, embedded).
+
+        New chunks are added before the old ones are deleted, so the file never drops
+        out of search. Occurrences other files folded into an unchanged chunk are kept.
+        """
+        vector_db = self._open_store()
+        collection = vector_db._collection
+        existing = collection.get(where={"source_file": source_file}, include=["documents", "embeddings", "metadatas"])
+
+        previous = {}
+        for text, embedding, meta in zip(existing["documents"], existing["embeddings"], existing["metadatas"]):
+            previous.setdefault(text, (list(embedding), meta))
+
+        if self.chunk_deduplicator is not None:
+            chunks = self.chunk_deduplicator.collapse(chunks)
+            with self._dedup_lock:
+                # Boilerplate stored under another file: drop this file's old labels there,
+                # then fold the new chunks back in instead of storing them a second time
+                self._scrub_occurrences(collection, source_file)
+                if chunks:
+                    chunks = self._fold_into_stored(collection, chunks, exclude_file=source_file)
+        elif isinstance(chunks, ChunkBatch):
+            chunks = list(chunks)
+
+        reused = embedded = 0
+        new_ids = set()
+        for start in range(0, len(chunks), batch_size):
+            batch = chunks[start:start + batch_size]
+            texts = [c.page_content for c in batch]
+            metadatas = []
+            for chunk in batch:
+                old = previous.get(chunk.page_content)
+                if old and self.chunk_deduplicator is not None and "occurrences" in old[1]:
+                    self.chunk_deduplicator.add_occurrence(chunk.metadata, old[1])
+                    # add_occurrence counts the chunk itself twice when it was stored before
+                    chunk.metadata["occurrence_count"] = len(json.loads(chunk.metadata["occurrences"]))
+                metadatas.append(chunk.metadata)
+
+            missing = [i for i, text in enumerate(texts) if text not in previous]
+            vectors = [previous[text][0] if text in previous else None for text in texts]
+            if missing:
+                fresh = self.embeddings.embed_documents([texts[i] for i in missing])
+                for i, vector in zip(missing, fresh):
+                    vectors[i] = vector
+            reused += len(texts) - len(missing)
+            embedded += len(missing)
+
+            ids = [chunk_id(self.collection_name, source_file, text, meta.get("parent_id"))
+                   for text, meta in zip(texts, metadatas)]
+            new_ids.update(ids)
+            self._upsert(collection, texts, metadatas, embeddings=dict(zip(ids, vectors)))
+
+        # Unchanged chunks kept their deterministic ID; only chunks that are gone are deleted
+        stale = [doc_id for doc_id in existing["ids"] if doc_id not in new_ids]
+        self._delete_chunks(collection, stale, source_file)
+        return reused, embedded
+
+    def _file_ids(self, collection, source_file, page_size=5000):
+        """All chunk IDs of a file, fetched page by page (no documents/embeddings)."""
+        ids = []
+        while True:
+            page = collection.get(where={"source_file": source_file}, include=[], limit=page_size, offset=len(ids))
+            ids.extend(page["ids"])
+            if len(page["ids"]) < page_size:
+                return ids
+
+    def _delete_chunks(self, collection, ids, source_file, batch_size=5000):
+        """
+        Deletes chunks of `source_file` in batches. A chunk other files were folded into
+        (shared boilerplate) is first re-homed on one of them, so those files keep it.
+        Returns the number of chunks deleted.
+        """
+        deleted = 0
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            if self.chunk_deduplicator is not None:
+                rows = collection.get(ids=batch, include=["metadatas"])
+                shared = [doc_id for doc_id, meta in zip(rows["ids"], rows["metadatas"])
+                          if (meta or {}).get("occurrence_count", 1) > 1 and doc_id not in self._absorbed]
+                if shared:
+                    self._rehome(collection, shared, source_file)
+            with self._write_lock:
+                collection.delete(ids=batch)
+            mark_collection_changed(self.collection_name)
+            if self.use_sparse_index:
+                get_sparse_index(self.collection_name).delete(batch)
+            deleted += len(batch)
+        return deleted
+
+    def _rehome(self, collection, ids, source_file):
+        rows = collection.get(ids=ids, include=["documents", "embeddings", "metadatas"])
+        texts, metadatas, vectors = [], [], {}
+        for text, embedding, meta in zip(rows["documents"], rows["embeddings"], rows["metadatas"]):
+            rehomed = self.chunk_deduplicator.drop_occurrences(meta, source_file)
+            if rehomed is None:
+                continue
+            texts.append(text)
+            metadatas.append(rehomed)
+            vectors[chunk_id(self.collection_name, rehomed["source_file"], text, rehomed.get("parent_id"))] = list(embedding)
+        if texts:
+            self._upsert(collection, texts, metadatas, embeddings=vectors)
+
+    def _scrub_occurrences(self, collection, source_file, page_size=5000):
+        """
+        Removes `source_file` (a name or a set of names) from the occurrences of other files'
+        chunks it was folded into. Only shared chunks (occurrence_count > 1) are read, a
+        small part of a case.
+        """
+        names = {source_file} if isinstance(source_file, str) else set(source_file)
+        updates = {}
+        offset = 0
+        while True:
+            page = collection.get(where={"occurrence_count": {"$gt": 1}}, include=["metadatas"],
+                                  limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+            for doc_id, meta in zip(page["ids"], page["metadatas"]):
+                labels = json.loads(meta.get("occurrences", "[]"))
+                others = [label for label in labels if label.split("#p")[0] not in names]
+                if len(others) != len(labels) and meta.get("source_file") not in names:
+                    updates[doc_id] = {**meta, "occurrences": json.dumps(others), "occurrence_count": len(others)}
+        # Applied after the scan: updated chunks drop out of the filter and would shift the pages
+        ids = list(updates)
+        for start in range(0, len(ids), page_size):
+            batch = ids[start:start + page_size]
+            with self._write_lock:
+                collection.update(ids=batch, metadatas=[updates[i] for i in batch])
+        return len(ids)
+
+    def begin_replace(self, source_file):
+        """
+        Starts re-indexing a file: returns the IDs of its current chunks and records every
+        chunk written for it until finish_replace() deletes the ones that were not.
+        """
+        collection = self._open_store()._collection
+        old_ids = self._file_ids(collection, source_file)
+        with self._replace_lock:
+            self._replacing[source_file] = (set(old_ids), set())
+        return old_ids
+
+    def finish_replace(self, source_file, old_ids, success=True):
+        """Deletes the old chunks the new version did not write again. Returns how many."""
+        with self._replace_lock:
+            _old, written = self._replacing.pop(source_file, (None, set()))
+        if not success:
+            # Keep the old version searchable rather than leaving half a file
+            return 0
+        collection = self._open_store()._collection
+        stale = [doc_id for doc_id in old_ids if doc_id not in written]
+        try:
+            return self._delete_chunks(collection, stale, source_file)
+        finally:
+            with self._replace_lock:
+                self._absorbed.difference_update(stale)
+
+    def replace_source_file(self, source_file, chunks):
+        """
+        Replaces every chunk of `source_file` with `chunks`. The new chunks are upserted
+        before the stale ones are deleted, so searches never see the file missing.
+        """
+        try:
+            old_ids = self.begin_replace(source_file)
+        except Exception as e:
+            print(f"❌ Error reading chunks of {source_file}: {e}")
+            return None
+        vector_db = self.store_documents(chunks)
+        try:
+            removed = self.finish_replace(source_file, old_ids, success=vector_db is not None)
+        except Exception as e:
+            print(f"❌ Error removing old chunks of {source_file}: {e}")
+            return None
+        if removed:
+            print(f"🧹 {source_file}: removed {removed} chunks of the previous version")
+        return vector_db
+
+    def _forget_file(self, source_file):
+        """
+        Drops the file from the case's side stores (parents, manifest, time index, file dedup).
+        Its sparse-index rows go with the chunks in _delete_chunks.
+        """
+        from engine.parent_store import ParentStore
+        from engine.chunk_manifest import get_manifest
+        from engine.time_index import get_time_index
+        from engine.dedup import get_deduplicator
+
+        ParentStore(self.collection_name).delete_file(source_file)
+        get_manifest(self.collection_name).forget(source_file)
+        get_time_index(self.collection_name).forget(source_file)
+        get_deduplicator(self.collection_name).forget(source_file)
+
+    def _member_files(self, collection, container, page_size=5000):
+        """
+        Stored names of the members and attachments of an archive/mailbox, which are
+        indexed as "<container>/<member>" with parent_file=<container>.
+        """
+        from engine.chunk_manifest import get_manifest
+        from engine.time_index import get_time_index
+        from engine.dedup import get_deduplicator
+
+        prefix = container + "/"
+        members = set()
+        offset = 0
+        while True:
+            page = collection.get(where={"parent_file": container}, include=["metadatas"],
+                                  limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+            members.update(meta.get("source_file", "") for meta in page["metadatas"])
+        # Members whose chunks were all folded into other files' chunks only remain as
+        # occurrence labels and side-store entries
+        offset = 0
+        while True:
+            page = collection.get(where={"occurrence_count": {"$gt": 1}}, include=["metadatas"],
+                                  limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+            for meta in page["metadatas"]:
+                members.update(label.split("#p")[0] for label in json.loads(meta.get("occurrences", "[]")))
+        members.update(get_manifest(self.collection_name).names())
+        members.update(get_time_index(self.collection_name).media_files())
+        members.update(get_deduplicator(self.collection_name).names())
+        return sorted(name for name in members if name.startswith(prefix))
+
+    def delete_file(self, source_file, batch_size=5000):
+        """
+        Removes a file from the case: its chunks (in batches) and its side-store entries.
+        Deleting an archive or mailbox also removes every member and attachment indexed from it.
+        """
+        try:
+            collection = self._open_store()._collection
+            names = [source_file] + self._member_files(collection, source_file)
+            deleted = 0
+            for name in names:
+                while True:
+                    # Deleted/re-homed chunks drop out of the filter, so always read the first page
+                    page = collection.get(where={"source_file": name}, include=[], limit=batch_size)
+                    if not page["ids"]:
+                        break
+                    deleted += self._delete_chunks(collection, page["ids"], name, batch_size)
+            scrubbed = self._scrub_occurrences(collection, names)
+            for name in names:
+                self._forget_file(name)
+            if len(names) > 1:
+                print(f"🗑️ {source_file}: also removed {len(names) - 1} archive members / attachments")
+            print(f"🗑️ {source_file}: deleted {deleted} chunks from {self.collection_name}"
+                  f"{f', removed from {scrubbed} shared chunks' if scrubbed else ''}")
+            return deleted
+        except Exception as e:
+            print(f"❌ Error deleting {source_file}: {e}")
+            return None
+
+    def purge_case(self):
+        """Drops the case's whole collection and its side stores."""
+        from engine.parent_store import ParentStore
+        from engine.chunk_manifest import get_manifest
+        from engine.time_index import get_time_index
+        from engine.dedup import get_deduplicator
+
+        try:
+            client = get_client(self.persist_directory)
+            with self._dedup_lock, self._write_lock:
+                # Dropping the collection removes its segments at once, no per-chunk deletes
+                try:
+                    client.delete_collection(self.collection_name)
+                except (ValueError, NotFoundError):
+                    pass  # Nothing was ever indexed for this case
+                self._store = None
+            ParentStore(self.collection_name).clear()
+            get_manifest(self.collection_name).clear()
+            get_time_index(self.collection_name).clear()
+            get_deduplicator(self.collection_name).clear()
+            get_sparse_index(self.collection_name).clear()
+            get_quantized_store(self.collection_name).delete()
+            print(f"🗑️ Case {self.collection_name} purged")
+            return True
+        except Exception as e:
+            print(f"❌ Error purging case {self.collection_name}: {e}")
+            return False
+
+    def store_hierarchical(self, parents, children):
+        """Parent windows go to the case's ParentStore, only the child chunks are embedded."""
+        from engine.parent_store import ParentStore
+
+        try:
+            ParentStore(self.collection_name).put_many(parents)
+        except Exception as e:
+            print(f"❌ Error saving parent chunks: {e}")
+            return None
+        return self.store_documents(children)
+
+    def mark_complete(self, source_file):
+        """Flips `ingest_status` to "complete" on every chunk of a progressively indexed file."""
+        try:
+            vector_db = self._open_store()
+            existing = vector_db.get(where={"source_file": source_file}, include=["metadatas"])
+            if not existing["ids"]:
+                return 0
+            metadatas = [{**meta, "ingest_status": "complete"} for meta in existing["metadatas"]]
+            with self._write_lock:
+                vector_db._collection.update(ids=existing["ids"], metadatas=metadatas)
+            return len(existing["ids"])
+        except Exception as e:
+            print(f"❌ Error marking {source_file} complete: {e}")
+            return 0
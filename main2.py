@@ -1,41 +1,327 @@
 import os
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import BoundedSemaphore
 from dotenv import load_dotenv
 
+from parsers.containers import is_container, iter_members
+from engine.chunk_manifest import get_manifest
+from engine.time_index import get_time_index
+
 # from parsers.all_parser8 import SmartDocumentParser
 # from engine.chunker2 import RAGChunker
 # from engine.vector_db import VectorEngine
 
 load_dotenv()
 
-def process_single_file(file_path, parser, chunker, vector_db):
-    """Handles the full pipeline for one file."""
-    try:
-        # STEP A: Extraction
-        parsed_results = parser.process(file_path)
-        
-        if not parsed_results or "markdown" not in parsed_results:
-            return f"FAILED: {file_path.name} (Parsing issue)"
+# Chunks per store_documents call when the chunker streams
+STREAM_STORE_BATCH = 256
+
+# Files whose useful content is appended to the markdown by the parser (not in the JSON)
+MARKDOWN_ONLY_EXTENSIONS = ('.mp3', '.mp4', '.wav', '.mov', '.avi', '.png', '.jpg', '.jpeg', '.bmp', '.gif')
+# Timestamped transcripts / visual timelines
+MEDIA_EXTENSIONS = ('.mp3', '.mp4', '.wav', '.mov', '.avi')
+
+
+def source_name(file_path, root=None):
+    """
+    Name a file's chunks are stored under: its path relative to the input folder, so
+    two "statement.pdf" in different subfolders don't replace each other's chunks.
+    """
+    file_path = Path(file_path)
+    if root is None:
+        return file_path.name
+    return file_path.relative_to(root).as_posix()
 
-        md_path = Path(parsed_results["markdown"])
-        with open(md_path, "r", encoding="utf-8") as f:
-            content = f.read()
+def index_parsed_result(name, parsed_results, chunker, vector_db, chunk_pool=None):
+    """
+    Chunks and indexes the markdown written by the parser (steps B-D of the pipeline).
+    With a ParallelChunker the chunking itself runs in one of its worker processes.
+    """
+    if not parsed_results or "markdown" not in parsed_results:
+        return f"FAILED: {name} (Parsing issue)"
+
+    md_path = Path(parsed_results["markdown"])
+    provenance = parsed_results.get("provenance")
+
+    # Media/image enrichments (summaries, visual timeline) only exist in the markdown
+    media_or_image = Path(name).suffix.lower() in MARKDOWN_ONLY_EXTENSIONS
+
+    # Indexing a file again (re-upload) replaces its old chunks once the new ones are stored
+    old_ids = vector_db.begin_replace(name)
+    success = False
+    try:
+        if getattr(chunker, "media_chunker", None) and Path(name).suffix.lower() in MEDIA_EXTENSIONS:
+            # STEP B-D on time windows; the interval index makes "minute 42" a direct lookup
+            with open(md_path, "r", encoding="utf-8") as f:
+                chunks = chunker.create_media_chunks(f.read(), name, extra_metadata=provenance)
+            chunk_count = len(chunks)
+            success = vector_db.store_documents(chunks)
+            if success:
+                get_time_index(vector_db.collection_name).record(name, chunks)
+        elif getattr(chunker, "hierarchical", False):
+            # STEP B-D small-to-big: children are embedded, parents kept for the prompt
+            with open(md_path, "r", encoding="utf-8") as f:
+                parents, children = chunker.create_hierarchical_chunks(f.read(), name, extra_metadata=provenance)
+            chunk_count = len(children)
+            success = vector_db.store_hierarchical(parents, children)
+        elif chunk_pool is not None:
+            # STEP B & C in a chunking process, STEP D here
+            json_path = None if media_or_image else parsed_results.get("json")
+            chunks = chunk_pool.chunk(name, md_path, json_path, extra_metadata=provenance)
+            chunk_count = len(chunks)
+            success = vector_db.store_documents(chunks) if chunks else True
+        elif getattr(chunker, "structured", False) and parsed_results.get("json") and not media_or_image:
+            # STEP B-D from the DoclingDocument tree (tables/lists intact, page + section metadata)
+            chunks = chunker.create_chunks_from_docling(parsed_results["json"], name, extra_metadata=provenance)
+            chunk_count = len(chunks)
+            success = vector_db.store_documents(chunks)
+        elif getattr(chunker, "streaming", False):
+            # STEP B-D streamed: chunks are stored in batches while the markdown is still being read
+            success, chunk_count = True, 0
+            for batch in chunker.iter_file_chunk_batches(md_path, name, extra_metadata=provenance,
+                                                         batch_size=STREAM_STORE_BATCH):
+                chunk_count += len(batch)
+                success = bool(vector_db.store_documents(batch)) and success
+        else:
+            with open(md_path, "r", encoding="utf-8") as f:
+                content = f.read()
         
-        # STEP B & C: Chunking & Metadata
-        chunks = chunker.create_chunks(content, file_path.name)
-        # for chunk in chunks:
-        #     chunk.metadata["source_file"] = file_path.name
+            # STEP B & C: Chunking & Metadata (archive members keep parent/child provenance)
+            chunks = chunker.create_chunk_batch(content, name, extra_metadata=provenance)
+            chunk_count = len(chunks)
         
-        # STEP D: Indexing (Wrapped in try-except in vector_db)
-        success = vector_db.store_documents(chunks)
-        if success:
-            return f"SUCCESS: {file_path.name}"
+            # STEP D: Indexing (Wrapped in try-except in vector_db)
+            success = vector_db.store_documents(chunks)
+    finally:
+        vector_db.finish_replace(name, old_ids, success=bool(success))
+
+    if success:
+        # Remember how this file was chunked so rebuild.py can re-chunk it differentially
+        get_manifest(vector_db.collection_name).record(name, chunker, parsed_results, chunk_count)
+        return f"SUCCESS: {name}"
+    else:
+        return f"PARTIAL SUCCESS: {name} (Parsed but Indexing failed)"
+
+def index_progressively(file_path, parser, chunker, vector_db, pages_per_batch=10, name=None):
+    """
+    Indexes a long PDF batch by batch while Docling is still converting the rest,
+    so the first pages are searchable within minutes. Chunks carry page_start/page_end
+    and ingest_status="partial" until the whole file is done.
+    """
+    name = name or file_path.name
+    indexed_batches = 0
+    chunk_count = 0
+    # The previous version stays searchable until the whole new one is indexed
+    old_ids = vector_db.begin_replace(name)
+    done = False
+    failed_pages = []
+    try:
+        for batch in parser.process_progressive(file_path, pages_per_batch=pages_per_batch):
+            if batch.get("done"):
+                failed_pages.extend(batch.get("failed_pages", []))
+                done = not failed_pages
+                break
+
+            batch_metadata = {"ingest_status": "partial"}
+            parents = None
+            if getattr(chunker, "structured", False):
+                # Structured chunks already carry their own page_start/page_end
+                chunks = chunker.create_chunks_from_docling(batch["document"], name, extra_metadata=batch_metadata)
+            elif getattr(chunker, "hierarchical", False):
+                batch_metadata.update({"page_start": batch["page_start"], "page_end": batch["page_end"]})
+                parents, chunks = chunker.create_hierarchical_chunks(batch["markdown"], name, extra_metadata=batch_metadata)
+            else:
+                batch_metadata.update({"page_start": batch["page_start"], "page_end": batch["page_end"]})
+                chunks = chunker.create_chunks(batch["markdown"], name, extra_metadata=batch_metadata)
+
+            if parents is not None:
+                stored = chunks and vector_db.store_hierarchical(parents, chunks)
+            else:
+                stored = chunks and vector_db.store_documents(chunks)
+            if stored:
+                indexed_batches += 1
+                chunk_count += len(chunks)
+                print(f"📄 {name}: pages {batch['page_start']}-{batch['page_end']} searchable")
+            elif chunks:
+                failed_pages.append([batch["page_start"], batch["page_end"]])
+    finally:
+        vector_db.finish_replace(name, old_ids, success=done)
+
+    if done:
+        vector_db.mark_complete(name)
+        get_manifest(vector_db.collection_name).record(name, chunker, batch, chunk_count)
+        return f"SUCCESS: {name} ({indexed_batches} page batches indexed progressively)"
+    if failed_pages:
+        # Not marked complete: its chunks keep ingest_status="partial" and no manifest entry
+        ranges = ", ".join(f"{start}-{end}" for start, end in failed_pages)
+        return f"PARTIAL SUCCESS: {name} ({indexed_batches} page batches indexed, pages {ranges} failed)"
+    return f"PARTIAL SUCCESS: {name} ({indexed_batches} page batches indexed, conversion incomplete)"
+
+def process_single_file(file_path, parser, chunker, vector_db, deduplicator=None, member=None,
+                        progressive_min_pages=None, root=None):
+    """Handles the full pipeline for one file (or one member streamed out of an archive/mailbox)."""
+    name = member.container_path if member else source_name(file_path, root)
+    try:
+        # STEP 0: Duplicate check (cheap text only, before Docling runs)
+        if deduplicator:
+            if member:
+                original, score = deduplicator.check(member.name, data=member.data, name=name)
+            else:
+                original, score = deduplicator.check(file_path, name=name)
+            if original:
+                return f"SKIPPED: {name} (duplicate of {original})"
+
+        # Long PDFs can be indexed page batch by page batch instead of all at the end
+        if progressive_min_pages and not member and parser.page_count(file_path) >= progressive_min_pages:
+            result = index_progressively(file_path, parser, chunker, vector_db, name=name)
         else:
-            return f"PARTIAL SUCCESS: {file_path.name} (Parsed but Indexing failed)"
+            # STEP A: Extraction
+            parsed_results = parser.process_member(member) if member else parser.process(file_path)
+            result = index_parsed_result(name, parsed_results, chunker, vector_db)
 
     except Exception as e:
-        return f"ERROR processing {file_path.name}: {str(e)}"
+        result = f"ERROR processing {name}: {str(e)}"
+
+    # Only fully indexed files become originals for later duplicate checks
+    if deduplicator:
+        orphans = deduplicator.finish(name, success=result.startswith("SUCCESS"))
+        if orphans:
+            result += f" | NOT INDEXED, skipped as copies of it (ingest them again): {', '.join(orphans)}"
+    return result
+
+def ingest_paths(paths, parser, chunker, vector_db, deduplicator=None, max_workers=4,
+                 progressive_min_pages=None, root=None):
+    """
+    Runs process_single_file over `paths` in a thread pool and yields each result line.
+    Archives and mailboxes are expanded as a stream: every member (and attachment)
+    is submitted to the pool as soon as it is read, without unpacking to disk.
+    PDFs with at least `progressive_min_pages` pages are indexed progressively.
+    Files are named by their path relative to `root` (default: bare file name).
+    """
+    # Caps how many archive members sit in memory waiting for a worker
+    in_flight = BoundedSemaphore(max_workers * 2)
+
+    def run(f, member=None):
+        try:
+            return process_single_file(f, parser, chunker, vector_db, deduplicator, member=member,
+                                       progressive_min_pages=progressive_min_pages, root=root)
+        finally:
+            in_flight.release()
+
+    # Use ThreadPoolExecutor for parallel parsing
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for f in paths:
+            f = Path(f)
+            if is_container(f):
+                print(f"📦 Expanding: {f.name}")
+                name = source_name(f, root)
+                for member in iter_members(f, parent_file=name, prefix=name):
+                    in_flight.acquire()
+                    futures[executor.submit(run, f, member)] = member.container_path
+            else:
+                in_flight.acquire()
+                futures[executor.submit(run, f)] = f
+
+        for future in as_completed(futures):
+            yield future.result()
+
+def ingest_paths_supervised(paths, chunker, vector_db, deduplicator=None, num_workers=4,
+                            timeout=900, max_files_per_worker=200, max_memory_mb=6144, chunk_workers=0,
+                            root=None):
+    """
+    Like ingest_paths, but parsing runs in a SupervisedParserPool: every file gets a
+    wall-clock limit, hung/crashed workers are replaced and workers are recycled.
+    Indexing stays in this process and overlaps with parsing; with chunk_workers > 0
+    the chunking moves to a ParallelChunker process pool as well.
+    """
+    from parsers.worker_pool import SupervisedParserPool
+
+    skipped = []
+    names = {}   # str(path) -> source name (relative to root)
+
+    def items():
+        for f in paths:
+            f = Path(f)
+            name = names[str(f)] = source_name(f, root)
+            members = iter_members(f, parent_file=name, prefix=name) if is_container(f) else [None]
+            for member in members:
+                # Dedup runs here so duplicates never reach a parser worker
+                if deduplicator:
+                    if member:
+                        original, score = deduplicator.check(member.name, data=member.data, name=member.container_path)
+                    else:
+                        original, score = deduplicator.check(f, name=name)
+                    if original:
+                        name = member.container_path if member else name
+                        skipped.append(f"SKIPPED: {name} (duplicate of {original})")
+                        continue
+                yield member if member else f
+
+    pool = SupervisedParserPool(
+        num_workers=num_workers,
+        timeout=timeout,
+        max_files_per_worker=max_files_per_worker,
+        max_memory_mb=max_memory_mb
+    )
+
+    chunk_pool = None
+    if chunk_workers and not chunker.semantic_chunker and not chunker.hierarchical:
+        from engine.chunkers.chunk_pool import ParallelChunker
+        chunk_pool = ParallelChunker.from_chunker(chunker, num_workers=chunk_workers)
+
+    # Indexer threads mostly wait on chunk workers / the embedder, so one per chunk worker
+    with ThreadPoolExecutor(max_workers=max(2, chunk_workers)) as indexer:
+        futures = {}
+        for item, parsed_results in pool.imap(items()):
+            name = item.container_path if hasattr(item, "container_path") else names[str(item)]
+            futures[indexer.submit(index_parsed_result, name, parsed_results, chunker, vector_db, chunk_pool)] = name
+            while skipped:
+                yield skipped.pop(0)
+
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = f"ERROR indexing: {str(e)}"
+            if deduplicator:
+                orphans = deduplicator.finish(futures[future], success=result.startswith("SUCCESS"))
+                if orphans:
+                    result += f" | NOT INDEXED, skipped as copies of it (ingest them again): {', '.join(orphans)}"
+            yield result
+
+    if chunk_pool:
+        chunk_pool.shutdown()
+    yield from skipped
+    print(pool.failure_report())
+
+def build_chunker(vector_db, chunk_size=None, chunk_overlap=None):
+    """RAGChunker configured from the environment (shared by ingestion and rebuild.py)."""
+    from engine.chunkers.chunker4 import RAGChunker
+
+    # CHUNK_MAX_TOKENS=model sizes chunks to the embedding model window, a number to an explicit token limit
+    max_tokens = os.getenv("CHUNK_MAX_TOKENS", "").strip().lower()
+    if max_tokens == "model":
+        max_tokens = True
+    else:
+        max_tokens = int(max_tokens or "0") or None
+    # CHUNK_MODE: markdown (streaming, default) | structured (DoclingDocument JSON) | semantic (topic shifts)
+    #             | hierarchical (small embedded children, parent windows returned to the LLM)
+    chunk_mode = os.getenv("CHUNK_MODE", "markdown")
+    hierarchical = chunk_mode == "hierarchical"
+    if chunk_size is None:
+        chunk_size = 400 if hierarchical else 800
+    if chunk_overlap is None:
+        chunk_overlap = 40 if hierarchical else 80
+    # MEDIA_WINDOW_SECONDS=0 chunks audio/video transcripts like any other markdown
+    media_window_seconds = int(os.getenv("MEDIA_WINDOW_SECONDS", "60"))
+    return RAGChunker(chunk_size=chunk_size, chunk_overlap=chunk_overlap, media_window_seconds=media_window_seconds,
+                      streaming=chunk_mode == "markdown", hierarchical=hierarchical, parent_size=2400,
+                      max_tokens=max_tokens,
+                      structured=chunk_mode == "structured",
+                      # Uncached: per-sentence vectors would only evict chunk vectors from the embedding cache
+                      semantic_embeddings=vector_db.batcher if chunk_mode == "semantic" else None)
 
 def run_ingestion_pipeline():
     # Initialize components
@@ -43,26 +329,68 @@ def run_ingestion_pipeline():
 
     
     from parsers.all_parser8 import SmartDocumentParser
-    from engine.chunkers.chunker4 import RAGChunker
     from engine.vector_db import VectorEngine
+    from engine.dedup import get_deduplicator
+    from engine.chroma_pool import get_client
     
-    parser = SmartDocumentParser(output_dir="data/output")
-    chunker = RAGChunker(chunk_size=800, chunk_overlap=80)
+    # EMBED_WORKERS=N embeds in N worker processes (0 = in this process, "auto" = cores left after parsing)
+    embed_workers = os.getenv("EMBED_WORKERS", "0")
+    embedding_pool = None
+    if embed_workers != "0":
+        from engine.embedding_pool import EmbeddingPool
+        from engine.model_registry import DEFAULT_EMBEDDING_MODEL
+        embedding_pool = EmbeddingPool(
+            DEFAULT_EMBEDDING_MODEL,
+            backend=os.getenv("EMBEDDING_BACKEND", "torch"),
+            num_workers=None if embed_workers == "auto" else int(embed_workers),
+            batch_size=int(os.getenv("EMBED_BATCH_SIZE", "64"))
+        )
+
     # vector_db = VectorEngine(collection_name=collection_name)
-    vector_db = VectorEngine(collection_name=case_id)
+    vector_db = VectorEngine(collection_name=case_id, embedding_pool=embedding_pool)
+    chunker = build_chunker(vector_db)
+    deduplicator = get_deduplicator(case_id)
 
-    input_folder = Path("data/input")
-    files_to_process = [f for f in input_folder.glob("*")]
+    # The server uploads into data/input/<case_id>/: ingest only this case's folder when it
+    # exists, otherwise data/input without the other cases' upload folders
+    input_folder = Path("data/input") / case_id
+    if input_folder.is_dir():
+        files_to_process = [f for f in input_folder.rglob("*") if f.is_file()]
+    else:
+        input_folder = Path("data/input")
+        other_cases = {c if isinstance(c, str) else c.name for c in get_client(vector_db.persist_directory).list_collections()}
+        files_to_process = [
+            f for f in input_folder.rglob("*")
+            if f.is_file() and f.relative_to(input_folder).parts[0] not in other_cases
+        ]
 
     print(f"🚀 Starting parallel ingestion for {len(files_to_process)} files...\n")
 
-    # Use ThreadPoolExecutor for parallel parsing
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = {executor.submit(process_single_file, f, parser, chunker, vector_db): f for f in files_to_process}
-        
-        for future in as_completed(futures):
-            result = future.result()
-            print(result)
+    # Backfills run parsing in supervised worker processes (per-file timeout, recycling);
+    # set INGEST_SUPERVISED=0 to use the in-process thread pool instead
+    if os.getenv("INGEST_SUPERVISED", "1") == "1":
+        results = ingest_paths_supervised(
+            files_to_process, chunker, vector_db, deduplicator,
+            timeout=int(os.getenv("PARSE_TIMEOUT_SECONDS", "900")),
+            # CHUNK_WORKERS=N chunks in N worker processes (not used in semantic mode)
+            chunk_workers=int(os.getenv("CHUNK_WORKERS", "0")),
+            root=input_folder
+        )
+    else:
+        parser = SmartDocumentParser(output_dir="data/output")
+        results = ingest_paths(files_to_process, parser, chunker, vector_db, deduplicator, root=input_folder)
+
+    for result in results:
+        print(result)
+
+    if chunker.token_report():
+        print(chunker.token_report())
+    print(vector_db.batcher.report())
+    if hasattr(vector_db.embeddings, "cache"):
+        print(vector_db.embeddings.cache.report())
+
+    if embedding_pool:
+        embedding_pool.shutdown()
 
     print("\n✅ Ingestion cycle complete.")
 
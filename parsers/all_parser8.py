@@ -9,6 +9,9 @@ from pathlib import Path
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import base64
+import tempfile
+from io import BytesIO
+from threading import BoundedSemaphore
 import requests
 import cv2
 from dotenv import load_dotenv
@@ -24,7 +27,7 @@ from docling.document_converter import (
     ExcelFormatOption,
     AudioFormatOption     
 )
-from docling.datamodel.base_models import InputFormat
+from docling.datamodel.base_models import InputFormat, DocumentStream
 from docling.datamodel.pipeline_options import (
     ThreadedPdfPipelineOptions,
     PictureDescriptionApiOptions,
@@ -33,12 +36,17 @@ from docling.datamodel.pipeline_options import (
     AsrPipelineOptions,
     RapidOcrOptions
 )
-from docling_core.types.doc.document import ImageRefMode
+from docling_core.types.doc.document import ImageRefMode, DoclingDocument
 
 from docling.datamodel.accelerator_options import AcceleratorOptions, AcceleratorDevice
 from docling.pipeline.asr_pipeline import AsrPipeline
 from docling.datamodel import asr_model_specs
 
+from parsers.containers import is_container, iter_members
+from parsers.media_summarizer import MediaSummarizer
+
+# Inputs that need a real file on disk (ffmpeg / OpenCV / direct image upload)
+DISK_ONLY_EXTENSIONS = ('.mp3', '.mp4', '.wav', '.mov', '.avi', '.png', '.jpg', '.jpeg', '.bmp', '.gif')
 
 
 load_dotenv()
@@ -52,6 +60,9 @@ class SmartDocumentParser:
 
         self.max_workers = max_workers or os.cpu_count()
 
+        # Long transcripts are summarized window by window, results cached under output_dir
+        self.media_summarizer = MediaSummarizer(cache_dir=self.output_dir / ".summary_cache")
+
         # ===============================
         # Azure Vision Setup
         # ===============================
@@ -219,21 +230,11 @@ class SmartDocumentParser:
             return None
 
     def summarize_media_content(self, text_content, file_type):
-        """Generates a high-level summary of a long transcript using Azure."""
+        """Generates a high-level summary of a long transcript using Azure (map-reduce over the full text)."""
         try:
-            az_api_key = os.getenv("AZURE_OPENAI_API_KEY")
-            azure_url = "https://newdocintel.openai.azure.com/openai/deployments/gpt-4.1/chat/completions?api-version=2024-02-15-preview"
-            
-            headers = {"Content-Type": "application/json", "api-key": az_api_key}
-            payload = {
-                "messages": [
-                    {"role": "system", "content": f"You are a media analyst. Summarize this {file_type} transcript in 3 bullet points."},
-                    {"role": "user", "content": text_content[:4000]} # Limit tokens
-                ]
-            }
-            resp = requests.post(azure_url, headers=headers, json=payload)
-            return resp.json()['choices'][0]['message']['content']
-        except:
+            return self.media_summarizer.summarize(text_content, file_type)
+        except Exception as e:
+            print(f"⚠️ Could not summarize media: {e}")
             return "No summary available."
         
     def extract_and_summarize_frames(self, video_path, doc_name, img_dir, interval_seconds=3):
@@ -302,11 +303,121 @@ class SmartDocumentParser:
             print(traceback.format_exc())
             return None
 
+    def page_count(self, file_path):
+        """Number of pages in a PDF (0 for anything else or if it cannot be opened)."""
+        if Path(file_path).suffix.lower() != ".pdf":
+            return 0
+        try:
+            import pypdfium2 as pdfium
+            pdf = pdfium.PdfDocument(str(file_path))
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+        except Exception:
+            return 0
+
+    def process_progressive(self, file_path, pages_per_batch=10):
+        """
+        Converts a PDF in page batches and yields each batch as soon as it is ready:
+            {"page_start", "page_end", "document", "markdown"}
+        After the last batch the usual outputs (markdown/JSON/images) are saved for the
+        whole document and a final {"done": True, "failed_pages": [[start, end], ...], **outputs}
+        item is yielded; failed_pages lists the batches Docling could not convert.
+        """
+        file_path = Path(file_path)
+        total_pages = self.page_count(file_path)
+        batch_documents = []
+        failed_pages = []
+
+        print(f"🔎 Parsing progressively: {file_path.name} ({total_pages} pages)")
+        for page_start in range(1, total_pages + 1, pages_per_batch):
+            page_end = min(page_start + pages_per_batch - 1, total_pages)
+            try:
+                result = self.converter.convert(str(file_path), page_range=(page_start, page_end))
+            except Exception:
+                print(f"❌ ERROR converting pages {page_start}-{page_end} of {file_path.name}")
+                print(traceback.format_exc())
+                failed_pages.append([page_start, page_end])
+                continue
+
+            batch_documents.append(result.document)
+            yield {
+                "page_start": page_start,
+                "page_end": page_end,
+                "document": result.document,
+                "markdown": result.document.export_to_markdown(image_mode=ImageRefMode.PLACEHOLDER)
+            }
+
+        if not batch_documents:
+            return
+
+        # Stitch the page batches back into one document for the saved outputs
+        if len(batch_documents) == 1:
+            document = batch_documents[0]
+        else:
+            document = DoclingDocument.concatenate(docs=batch_documents)
+        yield {"done": True, "failed_pages": failed_pages, **self._save_outputs(document, file_path)}
+
+    def process_member(self, member):
+        """Parses one file streamed out of an archive/mailbox (see parsers.containers)."""
+        virtual_path = Path(member.safe_name)
+
+        try:
+            print(f"🔎 Parsing: {member.container_path}")
+
+            if member.suffix in DISK_ONLY_EXTENSIONS:
+                # Media and standalone images go through ffmpeg/OpenCV/Azure which need a path
+                staging_dir = self.output_dir / "_staging"
+                staging_dir.mkdir(parents=True, exist_ok=True)
+                with tempfile.TemporaryDirectory(dir=staging_dir) as tmp:
+                    tmp_path = Path(tmp) / virtual_path.name
+                    tmp_path.write_bytes(member.data)
+                    result = self.process(tmp_path)
+            else:
+                if member.suffix == ".txt":
+                    conversion = self.converter.convert_string(
+                        member.data.decode("utf-8", errors="ignore"), format=InputFormat.MD
+                    )
+                else:
+                    conversion = self.converter.convert(
+                        DocumentStream(name=virtual_path.name, stream=BytesIO(member.data))
+                    )
+                result = self._save_outputs(conversion.document, virtual_path, provenance=member.provenance())
+
+            if result:
+                result["source_file"] = member.container_path
+                result["provenance"] = member.provenance()
+            return result
+
+        except Exception:
+            print(f"❌ ERROR processing {member.container_path}")
+            print(traceback.format_exc())
+            return None
+
     def process_batch(self, file_list):
         results = []
+        # Bound the number of in-memory archive members waiting for a worker
+        in_flight = BoundedSemaphore(self.max_workers * 2)
+
+        def run(fn, item):
+            try:
+                return fn(item)
+            finally:
+                in_flight.release()
 
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {executor.submit(self.process, f): f for f in file_list}
+            futures = {}
+            for f in file_list:
+                if is_container(f):
+                    # Members are submitted as they are discovered, so parsing starts
+                    # before the archive/mailbox has been fully read
+                    for member in iter_members(f):
+                        in_flight.acquire()
+                        futures[executor.submit(run, self.process_member, member)] = member.container_path
+                else:
+                    in_flight.acquire()
+                    futures[executor.submit(run, self.process, f)] = f
 
             for future in as_completed(futures):
                 try:
@@ -322,7 +433,7 @@ class SmartDocumentParser:
     # SAVE OUTPUTS
     # ==========================================================
 
-    def _save_outputs(self, document, file_path):
+    def _save_outputs(self, document, file_path, provenance=None):
 
         doc_name = file_path.stem.replace(" ", "_")
         base_dir = (self.output_dir / doc_name).resolve()
@@ -348,8 +459,9 @@ class SmartDocumentParser:
         enrichment_header = ""
         ext = file_path.suffix.lower()
         if ext in ['.mp3', '.mp4', '.wav', '.mov', '.avi']:
-            # Generate Global Summary
-            media_summary = self.summarize_media_content(md_file, ext)
+            # Generate Global Summary from the full transcript (not just its first few minutes)
+            transcript = md_file.read_text(encoding="utf-8")
+            media_summary = self.summarize_media_content(transcript, ext)
             header = f"## MEDIA SUMMARY ({ext.upper()})\n{media_summary}\n\n---\n\n"
             md_content = header
 
@@ -382,7 +494,8 @@ class SmartDocumentParser:
                 "source_file": str(file_path),
                 "file_name": file_path.name,
                 "file_type": file_path.suffix.lower(),
-                "parsed_timestamp": datetime.utcnow().isoformat()
+                "parsed_timestamp": datetime.utcnow().isoformat(),
+                **(provenance or {})
             },
             "document": document.export_to_dict()
         }
@@ -0,0 +1,158 @@
+import io
+import re
+import zipfile
+import tarfile
+from pathlib import Path
+from email import policy
+from email.parser import BytesParser
+
+# Extensions we expand instead of handing to Docling
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tgz", ".tar.gz", ".tar.bz2", ".tar.xz")
+MAIL_EXTENSIONS = (".eml", ".mbox")
+CONTAINER_EXTENSIONS = ARCHIVE_EXTENSIONS + MAIL_EXTENSIONS
+
+
+class ContainerMember:
+    """One file found inside an archive or mailbox, kept in memory (never unpacked to disk)."""
+
+    def __init__(self, name, data, parent_file, container_path):
+        self.name = name                      # leaf file name, e.g. "contract.pdf"
+        self.data = data                      # raw bytes
+        self.parent_file = parent_file        # top-level upload, e.g. "evidence.zip"
+        self.container_path = container_path  # full path, e.g. "evidence.zip/inbox.mbox/msg_00003.md/contract.pdf"
+
+    @property
+    def suffix(self):
+        return Path(self.name).suffix.lower()
+
+    @property
+    def safe_name(self):
+        """Flat, filesystem-safe name used for the output folder of this member."""
+        return re.sub(r"[^\w.-]+", "_", self.container_path.replace("/", "__"))
+
+    def provenance(self):
+        return {"parent_file": self.parent_file, "container_path": self.container_path}
+
+
+def is_container(name):
+    name = str(name).lower()
+    return name.endswith(CONTAINER_EXTENSIONS)
+
+
+def iter_members(file_path, data=None, parent_file=None, prefix=None, depth=0, max_depth=5):
+    """
+    Streams the members of an archive/mailbox one at a time.
+    Nested containers (zip in zip, attachments that are archives, mbox in zip) are
+    expanded recursively, so callers only ever see parseable leaf files.
+    """
+    file_path = Path(file_path)
+    parent_file = parent_file or file_path.name
+    prefix = prefix or file_path.name
+    lower = file_path.name.lower()
+
+    if depth > max_depth:
+        print(f"⚠️ Max container depth reached at {prefix}, skipping")
+        return
+
+    if lower.endswith(".zip"):
+        members = _iter_zip(file_path, data)
+    elif lower.endswith(ARCHIVE_EXTENSIONS):
+        members = _iter_tar(file_path, data)
+    elif lower.endswith(".eml"):
+        raw = data if data is not None else file_path.read_bytes()
+        members = _iter_email(BytesParser(policy=policy.default).parsebytes(raw), file_path.stem)
+    elif lower.endswith(".mbox"):
+        members = _iter_mbox(file_path, data)
+    else:
+        return
+
+    for name, member_data in members:
+        container_path = f"{prefix}/{name}"
+        if is_container(name):
+            yield from iter_members(name, member_data, parent_file, container_path, depth + 1, max_depth)
+        else:
+            yield ContainerMember(Path(name).name, member_data, parent_file, container_path)
+
+
+# ==========================================================
+# FORMAT READERS (each yields (name, bytes) pairs lazily)
+# ==========================================================
+
+def _iter_zip(file_path, data):
+    source = io.BytesIO(data) if data is not None else file_path
+    with zipfile.ZipFile(source) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            with zf.open(info) as member:
+                yield info.filename, member.read()
+
+
+def _iter_tar(file_path, data):
+    # "r|*" is tar's streaming mode: members are read sequentially without seeking
+    if data is not None:
+        tf = tarfile.open(fileobj=io.BytesIO(data), mode="r|*")
+    else:
+        tf = tarfile.open(file_path, mode="r|*")
+    with tf:
+        for info in tf:
+            if not info.isfile():
+                continue
+            member = tf.extractfile(info)
+            if member is None:
+                continue
+            yield info.name, member.read()
+
+
+def _iter_mbox(file_path, data):
+    """Splits an mbox on its 'From ' separator lines without loading the whole file."""
+    stream = io.BytesIO(data) if data is not None else open(file_path, "rb")
+    with stream:
+        buffer = []
+        index = 0
+        for line in stream:
+            if line.startswith(b"From ") and buffer:
+                index += 1
+                msg = BytesParser(policy=policy.default).parsebytes(b"".join(buffer))
+                yield from _iter_email(msg, f"message_{index:05d}")
+                buffer = []
+            if not (line.startswith(b"From ") and not buffer):
+                buffer.append(line)
+        if buffer:
+            index += 1
+            msg = BytesParser(policy=policy.default).parsebytes(b"".join(buffer))
+            yield from _iter_email(msg, f"message_{index:05d}")
+
+
+def _iter_email(msg, stem):
+    """Yields the message itself as markdown, then every attachment."""
+    header = (
+        f"# {msg.get('subject', '(no subject)')}\n\n"
+        f"- **From:** {msg.get('from', '')}\n"
+        f"- **To:** {msg.get('to', '')}\n"
+        f"- **Cc:** {msg.get('cc', '')}\n"
+        f"- **Date:** {msg.get('date', '')}\n\n"
+    )
+
+    body = msg.get_body(preferencelist=("plain", "html"))
+    body_text = ""
+    if body is not None:
+        try:
+            body_text = body.get_content()
+        except Exception:
+            body_text = body.get_payload(decode=True).decode("utf-8", errors="ignore")
+        if body.get_content_type() == "text/html":
+            body_text = re.sub(r"<[^>]+>", " ", body_text)
+
+    yield f"{stem}.md", (header + body_text).encode("utf-8")
+
+    for i, part in enumerate(msg.iter_attachments()):
+        filename = part.get_filename() or f"attachment_{i + 1}"
+        payload = part.get_payload(decode=True)
+        if payload is None:
+            # message/rfc822 attachments (forwarded mails) carry a nested message
+            if part.get_content_type() == "message/rfc822":
+                nested = part.get_payload()[0] if isinstance(part.get_payload(), list) else part.get_payload()
+                yield from _iter_email(nested, f"{stem}/{Path(filename).stem}")
+            continue
+        yield f"{stem}/{filename}", payload
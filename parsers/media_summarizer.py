@@ -0,0 +1,144 @@
+import os
+import time
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from dotenv import load_dotenv
+
+load_dotenv()
+
+AZURE_URL = "https://newdocintel.openai.azure.com/openai/deployments/gpt-4.1/chat/completions?api-version=2024-02-15-preview"
+
+
+class RateLimiter:
+    """Simple thread-safe limiter: at most `requests_per_minute` calls, evenly spaced."""
+
+    def __init__(self, requests_per_minute=60):
+        self.interval = 60.0 / max(requests_per_minute, 1)
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class MediaSummarizer:
+    """
+    Map-reduce summarizer for long transcripts.
+
+    1. Map: split the full transcript into windows and summarize them concurrently
+       (bounded by `max_concurrency` and `requests_per_minute`).
+    2. Reduce: merge window summaries, recursing until they fit in one request.
+    Window summaries are cached on disk by content hash, so re-runs only pay for new text.
+    """
+
+    def __init__(self, cache_dir="data/output/.summary_cache", window_chars=12000,
+                 max_concurrency=4, requests_per_minute=60, timeout=60, max_retries=3):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.window_chars = window_chars
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    # ==========================================================
+    # AZURE CALL (cached + rate limited)
+    # ==========================================================
+
+    def _complete(self, system_prompt, text):
+        key = hashlib.sha256(f"gpt-4.1\n{system_prompt}\n{text}".encode("utf-8")).hexdigest()
+        cache_file = self.cache_dir / f"{key}.txt"
+        if cache_file.exists():
+            return cache_file.read_text(encoding="utf-8")
+
+        headers = {"Content-Type": "application/json", "api-key": os.getenv("AZURE_OPENAI_API_KEY")}
+        payload = {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": text}
+            ]
+        }
+
+        for attempt in range(self.max_retries):
+            self.rate_limiter.wait()
+            resp = requests.post(AZURE_URL, headers=headers, json=payload, timeout=self.timeout)
+            if resp.status_code == 429 or resp.status_code >= 500:
+                # Back off on throttling / transient errors
+                time.sleep(float(resp.headers.get("retry-after", 2 ** attempt)))
+                continue
+            resp.raise_for_status()
+            summary = resp.json()['choices'][0]['message']['content']
+            cache_file.write_text(summary, encoding="utf-8")
+            return summary
+
+        raise RuntimeError(f"Azure summarization failed after {self.max_retries} attempts")
+
+    # ==========================================================
+    # MAP / REDUCE
+    # ==========================================================
+
+    def split_windows(self, text):
+        """Splits on line boundaries into windows of roughly `window_chars` characters."""
+        windows, current, size = [], [], 0
+        for line in text.splitlines(keepends=True):
+            if size + len(line) > self.window_chars and current:
+                windows.append("".join(current))
+                current, size = [], 0
+            # A single giant line (no newlines in the transcript) is hard-split
+            while len(line) > self.window_chars:
+                windows.append(line[:self.window_chars])
+                line = line[self.window_chars:]
+            current.append(line)
+            size += len(line)
+        if current and "".join(current).strip():
+            windows.append("".join(current))
+        return windows
+
+    def _map(self, windows, file_type):
+        # No window position in the prompt: it is part of the cache key, and the same window
+        # must hit the cache when the transcript around it grows, shrinks or re-splits
+        prompt = (
+            f"You are a media analyst. This is one section of a {file_type} transcript. "
+            "Summarize the key events, people, numbers and claims in this section in at most 8 bullet points. "
+            "Keep any timestamps you see."
+        )
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = [executor.submit(self._complete, prompt, window) for window in windows]
+            # Keep window order so the reduce step sees the recording chronologically
+            return [f.result() for f in futures]
+
+    def _reduce(self, summaries, file_type):
+        combined = "\n\n".join(summaries)
+        if len(combined) > self.window_chars and len(summaries) > 1:
+            # Too long for one call: summarize groups of section summaries first
+            groups = self.split_windows(combined)
+            if len(groups) < len(summaries):
+                return self._reduce(self._map(groups, f"{file_type} summary"), file_type)
+
+        return self._complete(
+            f"You are a media analyst. Below are section summaries of a {file_type} transcript in order. "
+            "Summarize the whole recording in 3 bullet points.",
+            combined
+        )
+
+    def summarize(self, text, file_type):
+        windows = self.split_windows(text)
+        if not windows:
+            return "No summary available."
+        if len(windows) == 1:
+            return self._complete(
+                f"You are a media analyst. Summarize this {file_type} transcript in 3 bullet points.",
+                windows[0]
+            )
+        print(f"🧩 Summarizing {len(windows)} transcript windows ({file_type})")
+        return self._reduce(self._map(windows, file_type), file_type)
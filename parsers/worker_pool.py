@@ -0,0 +1,232 @@
+import os
+import time
+import queue
+import traceback
+import multiprocessing as mp
+from pathlib import Path
+
+# Workers are separate processes so a hung Docling/OpenCV call can actually be killed.
+# "spawn" avoids inheriting locks/threads from the parent (torch, onnxruntime, HTTP pools).
+_ctx = mp.get_context("spawn")
+
+
+def _rss_mb():
+    """Resident memory of the current process in MB (0 if it cannot be read)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        return 0
+
+
+def _worker_main(worker_id, task_q, result_q, parser_kwargs, max_files, max_memory_mb):
+    from parsers.all_parser8 import SmartDocumentParser
+
+    parser = SmartDocumentParser(**parser_kwargs)
+    processed = 0
+
+    while True:
+        task = task_q.get()
+        if task is None:
+            break
+
+        task_id, item = task
+        result_q.put(("started", worker_id, task_id, None, False))
+        try:
+            if hasattr(item, "container_path"):
+                kind, payload = "done", parser.process_member(item)
+            else:
+                kind, payload = "done", parser.process(item)
+        except Exception:
+            kind, payload = "error", traceback.format_exc()
+
+        processed += 1
+        # Recycle: native libraries leak across thousands of files, so start fresh periodically.
+        # The decision travels with the result so the supervisor never hands this worker more work.
+        retire = processed >= max_files or bool(max_memory_mb and _rss_mb() > max_memory_mb)
+        result_q.put((kind, worker_id, task_id, payload, retire))
+        if retire:
+            break
+
+
+class SupervisedParserPool:
+    """
+    Process pool for SmartDocumentParser with per-file wall-clock limits.
+
+    - Each worker handles one file at a time, so a hang is attributable to a file.
+    - A file running longer than `timeout` seconds gets its worker killed and replaced.
+    - Workers retire after `max_files_per_worker` files or above `max_memory_mb` RSS.
+    - Timeouts, crashes and exceptions are collected in `self.failures`.
+    """
+
+    def __init__(self, num_workers=4, timeout=900, startup_timeout=600,
+                 max_files_per_worker=200, max_memory_mb=6144, parser_kwargs=None):
+        self.num_workers = num_workers
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.max_files_per_worker = max_files_per_worker
+        self.max_memory_mb = max_memory_mb
+        self.parser_kwargs = parser_kwargs or {"output_dir": "data/output"}
+
+        self.result_q = _ctx.Queue()
+        self.workers = {}
+        self.failures = []
+        self._next_worker_id = 0
+
+    # ==========================================================
+    # WORKER MANAGEMENT
+    # ==========================================================
+
+    def _spawn(self):
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+        task_q = _ctx.Queue()
+        proc = _ctx.Process(
+            target=_worker_main,
+            args=(worker_id, task_q, self.result_q, self.parser_kwargs,
+                  self.max_files_per_worker, self.max_memory_mb),
+            daemon=True
+        )
+        proc.start()
+        self.workers[worker_id] = {
+            "proc": proc, "queue": task_q, "task": None,
+            "assigned_at": None, "started_at": None
+        }
+
+    def _retire(self, worker_id, kill=False):
+        worker = self.workers.pop(worker_id)
+        if kill:
+            worker["proc"].kill()
+        worker["proc"].join(timeout=10)
+
+    def _record_failure(self, task, reason, elapsed):
+        name = _item_name(task[1])
+        print(f"⏱️ {reason}: {name}" + (f" ({elapsed:.0f}s)" if elapsed is not None else ""))
+        self.failures.append({
+            "file": name,
+            "reason": reason,
+            "elapsed_seconds": round(elapsed, 1) if elapsed is not None else None
+        })
+
+    def _check_workers(self):
+        """Kills workers stuck past their limit, drops dead ones and returns the tasks they lost."""
+        lost = []
+        now = time.monotonic()
+        for worker_id in list(self.workers):
+            worker = self.workers[worker_id]
+            task = worker["task"]
+
+            if task is not None and worker["started_at"] is not None and now - worker["started_at"] > self.timeout:
+                self._record_failure(task, "Timed out", now - worker["started_at"])
+                self._retire(worker_id, kill=True)
+                lost.append(task)
+            elif task is not None and worker["started_at"] is None and now - worker["assigned_at"] > self.startup_timeout:
+                self._record_failure(task, "Worker failed to start", now - worker["assigned_at"])
+                self._retire(worker_id, kill=True)
+                lost.append(task)
+            elif not worker["proc"].is_alive():
+                if task is not None and worker["proc"].exitcode == 0:
+                    # Retired cleanly; its final "done" message is still queued
+                    continue
+                if task is not None:
+                    elapsed = now - (worker["started_at"] or worker["assigned_at"])
+                    self._record_failure(task, f"Worker crashed (exit code {worker['proc'].exitcode})", elapsed)
+                    lost.append(task)
+                self._retire(worker_id)
+        return lost
+
+    # ==========================================================
+    # PUBLIC API
+    # ==========================================================
+
+    def imap(self, items):
+        """
+        Yields (item, parsed_result) as files finish, in completion order.
+        parsed_result is None for files that failed, timed out or crashed.
+        `items` may be a generator (e.g. archive members streamed from parsers.containers).
+        """
+        items = iter(items)
+        pending = []
+        exhausted = False
+        next_task_id = 0
+
+        try:
+            while True:
+                # Replace killed/retired workers while there is work left
+                while len(self.workers) < self.num_workers and (pending or not exhausted):
+                    self._spawn()
+
+                # Pull only as many new items as there are idle workers (bounded memory)
+                idle = [wid for wid, w in self.workers.items() if w["task"] is None]
+                while not exhausted and len(pending) < len(idle):
+                    try:
+                        pending.append((next_task_id, next(items)))
+                        next_task_id += 1
+                    except StopIteration:
+                        exhausted = True
+
+                for worker_id in idle:
+                    if not pending:
+                        break
+                    worker = self.workers[worker_id]
+                    worker["task"] = pending.pop(0)
+                    worker["assigned_at"] = time.monotonic()
+                    worker["started_at"] = None
+                    worker["queue"].put(worker["task"])
+
+                if exhausted and not pending and all(w["task"] is None for w in self.workers.values()):
+                    break
+
+                try:
+                    kind, worker_id, task_id, payload, retire = self.result_q.get(timeout=1)
+                except queue.Empty:
+                    kind, worker_id, retire = None, None, False
+
+                # Messages from workers we already killed are ignored
+                worker = self.workers.get(worker_id)
+                if worker is not None:
+                    if kind == "started":
+                        worker["started_at"] = time.monotonic()
+                    elif kind in ("done", "error"):
+                        task, worker["task"] = worker["task"], None
+                        elapsed = time.monotonic() - (worker["started_at"] or worker["assigned_at"])
+                        if kind == "error":
+                            self._record_failure(task, "Parser error", elapsed)
+                            print(payload)
+                        elif payload is None:
+                            self._record_failure(task, "Parsing issue", elapsed)
+                        if retire:
+                            print(f"♻️ Recycling parser worker {worker_id}")
+                            self._retire(worker_id)
+                        yield task[1], payload if kind == "done" else None
+
+                for task in self._check_workers():
+                    yield task[1], None
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        for worker in self.workers.values():
+            if worker["proc"].is_alive() and worker["task"] is None:
+                worker["queue"].put(None)
+        for worker_id in list(self.workers):
+            worker = self.workers[worker_id]
+            self._retire(worker_id, kill=worker["task"] is not None)
+
+    def failure_report(self):
+        if not self.failures:
+            return "No parser failures."
+        lines = [f"❌ {len(self.failures)} file(s) failed:"]
+        for f in self.failures:
+            lines.append(f"  - {f['file']}: {f['reason']}")
+        return "\n".join(lines)
+
+
+def _item_name(item):
+    return item.container_path if hasattr(item, "container_path") else Path(item).name
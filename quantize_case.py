@@ -0,0 +1,34 @@
+import sys
+import argparse
+from dotenv import load_dotenv
+
+from engine.quantized_store import get_quantized_store
+
+load_dotenv()
+
+
+def quantize_case(case_id, dtype="int8", keep_full=True):
+    """
+    Writes the float16/int8 copy of a case's vectors that retriever6 searches with
+    quantized=True (QUANTIZED_SEARCH=1 on the server). Run again after large ingests.
+    """
+    from engine.chroma_pool import get_client
+
+    collection = get_client("./data/chroma_db").get_collection(case_id)
+    store = get_quantized_store(case_id)
+    print(f"🗜️ Quantizing {collection.count()} vectors of '{case_id}' to {dtype}")
+    count = store.build(collection, dtype=dtype, keep_full=keep_full)
+
+    full_mb = count * store.meta["dim"] * 4 / 1e6 if count else 0
+    print(f"✅ {count} vectors: {store.resident_bytes() / 1e6:.1f} MB searched in memory "
+          f"(float32: {full_mb:.1f} MB){', float32 copy kept on disk for re-rank' if keep_full else ''}")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Store a case's vectors in float16/int8 for low-memory search.")
+    arg_parser.add_argument("case_id")
+    arg_parser.add_argument("--dtype", choices=["int8", "float16"], default="int8")
+    arg_parser.add_argument("--no-full", action="store_true", help="don't keep the float32 copy used for exact re-rank")
+    args = arg_parser.parse_args(sys.argv[1:])
+
+    quantize_case(args.case_id, args.dtype, keep_full=not args.no_full)
@@ -0,0 +1,87 @@
+import sys
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv
+
+from engine.chunk_manifest import get_manifest, chunking_fingerprint
+from engine.time_index import get_time_index
+from main2 import build_chunker, MARKDOWN_ONLY_EXTENSIONS, MEDIA_EXTENSIONS
+
+load_dotenv()
+
+
+def rechunk_file(name, entry, chunker, vector_db):
+    """Re-chunks one document from the parser outputs recorded in the manifest."""
+    md_path = entry.get("markdown")
+    if not md_path or not Path(md_path).exists():
+        return None, f"SKIPPED: {name} (markdown output missing, re-ingest it)"
+
+    provenance = entry.get("provenance")
+    json_path = entry.get("json")
+    media_or_image = Path(name).suffix.lower() in MARKDOWN_ONLY_EXTENSIONS
+
+    if chunker.media_chunker and Path(name).suffix.lower() in MEDIA_EXTENSIONS:
+        with open(md_path, "r", encoding="utf-8") as f:
+            chunks = chunker.create_media_chunks(f.read(), name, extra_metadata=provenance)
+        get_time_index(vector_db.collection_name).record(name, chunks)
+    elif chunker.hierarchical:
+        from engine.parent_store import ParentStore
+
+        with open(md_path, "r", encoding="utf-8") as f:
+            parents, chunks = chunker.create_hierarchical_chunks(f.read(), name, extra_metadata=provenance)
+        store = ParentStore(vector_db.collection_name)
+        store.delete_file(name)
+        store.put_many(parents)
+    elif chunker.structured and json_path and Path(json_path).exists() and not media_or_image:
+        chunks = chunker.create_chunks_from_docling(json_path, name, extra_metadata=provenance)
+    elif chunker.streaming:
+        # Same splitter as ingestion (main2 index_parsed_result), so unchanged chunks keep their text
+        chunks = [chunk for batch in chunker.iter_file_chunk_batches(md_path, name, extra_metadata=provenance)
+                  for chunk in batch]
+    else:
+        with open(md_path, "r", encoding="utf-8") as f:
+            chunks = chunker.create_chunk_batch(f.read(), name, extra_metadata=provenance)
+
+    reused, embedded = vector_db.rechunk_source_file(name, chunks)
+    return len(chunks), f"REBUILT: {name} ({reused} vectors reused, {embedded} re-embedded)"
+
+
+def rebuild_case(case_id, chunk_size=None, chunk_overlap=None, force=False):
+    """
+    Brings every document of a case in line with the current chunking config.
+
+    Only documents whose manifest fingerprint differs are touched, and within those only
+    chunks whose text changed are embedded again (see VectorEngine.rechunk_source_file).
+    """
+    from engine.vector_db import VectorEngine
+
+    vector_db = VectorEngine(collection_name=case_id)
+    chunker = build_chunker(vector_db, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    manifest = get_manifest(case_id)
+
+    fingerprint, config = chunking_fingerprint(chunker)
+    targets = list(manifest.files) if force else manifest.stale(chunker)
+    print(f"🔁 Rebuilding {len(targets)} of {len(manifest.files)} documents in '{case_id}' -> {fingerprint} {config}")
+
+    for name in targets:
+        entry = manifest.files[name]
+        try:
+            chunk_count, message = rechunk_file(name, entry, chunker, vector_db)
+            if chunk_count is not None:
+                manifest.record(name, chunker, entry, chunk_count)
+        except Exception as e:
+            message = f"ERROR rebuilding {name}: {str(e)}"
+        print(message)
+
+    print("\n✅ Rebuild complete.")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Re-chunk a case with new chunking settings, reusing unchanged vectors.")
+    arg_parser.add_argument("case_id")
+    arg_parser.add_argument("--chunk-size", type=int, default=None)
+    arg_parser.add_argument("--chunk-overlap", type=int, default=None)
+    arg_parser.add_argument("--force", action="store_true", help="rebuild documents even if their fingerprint matches")
+    args = arg_parser.parse_args(sys.argv[1:])
+
+    rebuild_case(args.case_id, args.chunk_size, args.chunk_overlap, args.force)
@@ -1,5 +1,5 @@
 import os
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from langchain_classic.chains.summarize import load_summarize_chain
 from langchain_core.prompts import PromptTemplate
@@ -12,9 +12,12 @@ import shutil
 from parsers.all_parser8 import SmartDocumentParser
 from engine.chunkers.chunker4 import RAGChunker
 from engine.vector_db import VectorEngine
+from engine.dedup import get_deduplicator
+from main2 import ingest_paths
 from openai import AzureOpenAI
 from dotenv import load_dotenv
-from engine.retrievers.retriever2 import RAGRetriever
+from engine.retrievers.retriever6 import RAGRetriever
+from engine.collection_manager import CaseCollectionManager
 
 from langchain_openai import AzureChatOpenAI # Use the LangChain wrapper
 
@@ -46,20 +49,40 @@ app.add_middleware(
 
 # Global instances (Loaded ONCE on startup)
 parser = SmartDocumentParser(output_dir="data/output")
-chunker = RAGChunker(chunk_size=1500, chunk_overlap=200)
+# Warm the shared embedding model + tokenizer; every VectorEngine/RAGRetriever reuses them
+VectorEngine()
+# CHUNK_MODE=hierarchical embeds small child chunks and keeps larger parent windows for the prompt
+if os.getenv("CHUNK_MODE") == "hierarchical":
+    chunker = RAGChunker(chunk_size=400, chunk_overlap=40, hierarchical=True, parent_size=2400,
+                         media_window_seconds=60)
+else:
+    chunker = RAGChunker(chunk_size=1500, chunk_overlap=200, media_window_seconds=60)
+# Retrievers of recently used cases stay loaded (CASE_MEMORY_BUDGET_MB / MAX_LOADED_CASES)
+# QUANTIZED_SEARCH=1 searches cases from their float16/int8 vectors (see quantize_case.py)
+case_manager = CaseCollectionManager(
+    lambda case_id: RAGRetriever(collection_name=case_id, quantized=os.getenv("QUANTIZED_SEARCH") == "1"),
+    max_cases=int(os.getenv("MAX_LOADED_CASES", "64"))
+)
 
 class ChatRequest(BaseModel):
     message: str
     case_id: str
     history: Optional[List[dict]] = []
+    # Small-to-big: expand matched child chunks to their parent windows, capped at this many chars
+    max_context_chars: Optional[int] = None
 
 class DocSummarize(BaseModel):
     case_id: str
     filename: str
 
 @app.post("/ingest")
-async def ingest_files(case_id: str = Form(...), files: List[UploadFile] = File(...)):
-    """Uploads and processes files using your ingestion pipeline logic."""
+async def ingest_files(background_tasks: BackgroundTasks, case_id: str = Form(...),
+                       files: List[UploadFile] = File(...), progressive: bool = Form(False)):
+    """
+    Uploads and processes files using your ingestion pipeline logic.
+    With progressive=true the request returns right after upload and PDFs of 50+ pages
+    are indexed page batch by page batch in the background (chunks carry ingest_status).
+    """
     try:
         # 1. Setup directories
         input_dir = Path(f"data/input/{case_id}")
@@ -67,37 +90,31 @@ async def ingest_files(case_id: str = Form(...), files: List[UploadFile] = File(
         
         # 2. Initialize Vector DB for this specific case
         vector_db = VectorEngine(collection_name=case_id)
+        deduplicator = get_deduplicator(case_id)
         
-        results = []
+        saved_paths = []
         for file in files:
             # Save the file locally
             file_path = input_dir / file.filename
             with file_path.open("wb") as buffer:
                 shutil.copyfileobj(file.file, buffer)
-            
-            # --- START PIPELINE (Same as your process_single_file) ---
-            # Step A: Parsing
-            parsed_results = parser.process(file_path)
-            if not parsed_results or "markdown" not in parsed_results:
-                results.append(f"FAILED: {file.filename} (Parsing issue)")
-                continue
-
-            # Step B: Read Parsed Content
-            md_path = Path(parsed_results["markdown"])
-            with open(md_path, "r", encoding="utf-8") as f:
-                content = f.read()
-            
-            # Step C: Chunking
-            chunks = chunker.create_chunks(content, file.filename)
-            # for chunk in chunks:
-            #     chunk.metadata["source_file"] = file.filename
-            
-            # Step D: Storing
-            success = vector_db.store_documents(chunks)
-            if success:
-                results.append(f"SUCCESS: {file.filename}")
-            else:
-                results.append(f"PARTIAL SUCCESS: {file.filename} (Indexing failed)")
+            saved_paths.append(file_path)
+
+        # --- START PIPELINE (Same as your process_single_file) ---
+        # Dedup -> Parsing -> Chunking -> Storing, with ZIP/EML/MBOX uploads
+        # expanded member by member into the same worker pool
+        if progressive:
+            def run_in_background():
+                for result in ingest_paths(saved_paths, parser, chunker, vector_db, deduplicator,
+                                           progressive_min_pages=50, root=input_dir):
+                    print(result)
+                case_manager.refresh(case_id)
+
+            background_tasks.add_task(run_in_background)
+            return {"status": "accepted", "details": [f"QUEUED: {p.name}" for p in saved_paths]}
+
+        results = list(ingest_paths(saved_paths, parser, chunker, vector_db, deduplicator, root=input_dir))
+        case_manager.refresh(case_id)
 
         print("results:",results)   
         return {"status": "success", "details": results}
@@ -110,11 +127,14 @@ async def ingest_files(case_id: str = Form(...), files: List[UploadFile] = File(
 @app.post("/chat")
 async def chat(req: ChatRequest):
     """Handles RAG retrieval and GPT-4 response."""
-    # Initialize engine for this specific case
-    retriever = RAGRetriever(collection_name=req.case_id)
+    # Loaded once per case and kept while the case is in use
+    retriever = case_manager.get(req.case_id)
     
     # 1. Retrieve (Use your smarter logic here)
-    context, sources = retriever.get_relevant_context(req.message)
+    if req.max_context_chars:
+        context, sources = retriever.get_parent_context(req.message, max_chars=req.max_context_chars)
+    else:
+        context, sources = retriever.get_relevant_context(req.message)
     # context = "\n\n".join([f"SOURCE {d.metadata['source_file']}: {d.page_content}" for d in results])
     
     # 2. Azure OpenAI Call
@@ -163,8 +183,8 @@ async def doc_summarize(req:DocSummarize):
     """
     combine_prompt = PromptTemplate(template=combine_prompt_template, input_variables=["text"])
     try:
-        # 1. Initialize retriever for the specific case
-        retriever = RAGRetriever(collection_name=req.case_id)
+        # 1. Get the retriever for the specific case
+        retriever = case_manager.get(req.case_id)
         
         # 2. Get all chunks for the file
         docs = retriever.get_chunks(req.filename)
@@ -190,6 +210,53 @@ async def doc_summarize(req:DocSummarize):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/cases/stats")
+async def case_stats():
+    """Loaded cases, estimated memory and hit/miss counters of the case manager."""
+    return case_manager.stats()
+
+INPUT_ROOT = Path("data/input").resolve()
+
+
+def case_input_dir(case_id):
+    """data/input/<case_id>, refusing ids that would point anywhere else ("..", "a/b", absolute)."""
+    case_dir = (INPUT_ROOT / case_id).resolve()
+    if case_dir.parent != INPUT_ROOT:
+        raise HTTPException(status_code=400, detail=f"Invalid case id: {case_id}")
+    return case_dir
+
+
+@app.delete("/cases/{case_id}/files/{filename:path}")
+async def delete_file(case_id: str, filename: str):
+    """Removes one file from a case: its chunks, parent windows, manifest/time-index entries and upload."""
+    case_dir = case_input_dir(case_id)
+    upload = (case_dir / filename).resolve()
+    if not upload.is_relative_to(case_dir) or upload == case_dir:
+        raise HTTPException(status_code=400, detail=f"Invalid file name: {filename}")
+
+    vector_db = VectorEngine(collection_name=case_id)
+    deleted = vector_db.delete_file(filename)
+    if deleted is None:
+        raise HTTPException(status_code=500, detail=f"Could not delete {filename}")
+
+    if upload.is_file():
+        upload.unlink()
+    case_manager.refresh(case_id)
+    return {"status": "deleted", "case_id": case_id, "filename": filename, "chunks_deleted": deleted}
+
+
+@app.delete("/cases/{case_id}")
+async def delete_case(case_id: str):
+    """Purges a whole case (collection, side stores and uploaded files)."""
+    case_dir = case_input_dir(case_id)
+    # No cached handle during the purge: a concurrent /chat would re-cache one on the old collection
+    with case_manager.unloaded(case_id):
+        if not VectorEngine(collection_name=case_id).purge_case():
+            raise HTTPException(status_code=500, detail=f"Could not purge case {case_id}")
+        shutil.rmtree(case_dir, ignore_errors=True)
+    return {"status": "purged", "case_id": case_id}
+
+
 
 
 
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+from langchain_core.documents import Document
+
+# Run from anywhere: make the project root importable
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from engine.dedup import ChunkDeduplicator
+
+# Two statements from different files: same layout, different amounts / account / dates
+stmt_a = ("Statement period 01/03/2023 - 31/03/2023. Account 4471-0092. Opening balance 12,480.00. "
+          "Wire transfer to Kent Holdings 48,200.00 on 14/03/2023. Closing balance 3,920.50.")
+stmt_b = ("Statement period 01/04/2023 - 30/04/2023. Account 4471-0093. Opening balance 3,920.50. "
+          "Wire transfer to Kent Holdings 51,700.00 on 11/04/2023. Closing balance 1,210.75.")
+footer = "CONFIDENTIAL - This statement is provided for the account holder only. Page"
+
+chunks = [
+    Document(page_content=stmt_a, metadata={"source_file": "stmt_A.pdf"}),
+    Document(page_content=footer, metadata={"source_file": "stmt_A.pdf"}),
+    Document(page_content=stmt_b, metadata={"source_file": "stmt_B.pdf"}),
+    Document(page_content=footer, metadata={"source_file": "stmt_B.pdf"}),
+]
+
+kept = ChunkDeduplicator().collapse(chunks)
+texts = [c.page_content for c in kept]
+
+failed = False
+for name, text in (("stmt_A.pdf", stmt_a), ("stmt_B.pdf", stmt_b)):
+    ok = text in texts
+    failed = failed or not ok
+    print(f"  {name} statement kept as its own chunk: {'✅' if ok else '❌'}")
+
+footers = [c for c in kept if c.page_content == footer]
+ok = len(footers) == 1 and footers[0].metadata["occurrence_count"] == 2
+failed = failed or not ok
+print(f"  identical footer stored once with both occurrences: {'✅' if ok else '❌'}")
+
+if failed:
+    print("❌ Chunk dedup merged chunks with different content")
+    sys.exit(1)
+print("✅ Only identical chunks are folded")
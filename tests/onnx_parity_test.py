@@ -0,0 +1,56 @@
+import sys
+import time
+from pathlib import Path
+import numpy as np
+
+# Run from anywhere: make the project root importable
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from engine.model_registry import get_embeddings, get_onnx_embeddings, DEFAULT_EMBEDDING_MODEL
+
+# Minimum cosine similarity between the PyTorch vector and the ONNX vector of the same text
+THRESHOLDS = {"onnx": 0.999, "onnx-int8": 0.98}
+
+texts = [
+    "CONFIDENTIAL - SUBJECT TO PROTECTIVE ORDER",
+    "The wire transfer of $48,200 was sent to account 4471-0092 on 14 March 2023.",
+    "| Name | Phone | Email |\n|---|---|---|\n| J. Doe | +1 555 0142 | jdoe@example.com |",
+    "[00:42:10] (visual) A man in a grey jacket places a parcel on the reception desk.",
+    "Q: Did you meet the defendant before the meeting? A: No, I had only spoken to him by phone.",
+    "Invoice INV-2023-0457 lists 12 units of model X-200 at 1,150 EUR each.",
+    "hello",
+    " ".join(["The board approved the merger agreement after a lengthy discussion."] * 40),
+]
+
+
+def cosine(a, b):
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+print(f"🔍 Parity check for {DEFAULT_EMBEDDING_MODEL} on {len(texts)} texts")
+
+start = time.perf_counter()
+reference = get_embeddings(DEFAULT_EMBEDDING_MODEL).embed_documents(texts)
+print(f"  torch      : {time.perf_counter() - start:.2f}s")
+
+failed = False
+for backend, threshold in THRESHOLDS.items():
+    model = get_onnx_embeddings(DEFAULT_EMBEDDING_MODEL, quantize=backend == "onnx-int8")
+    start = time.perf_counter()
+    vectors = model.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+
+    scores = cosine(reference, vectors)
+    # Queries must match too (they drive /chat retrieval)
+    query_score = cosine([get_embeddings(DEFAULT_EMBEDDING_MODEL).embed_query(texts[1])], [model.embed_query(texts[1])])[0]
+    ok = scores.min() >= threshold and query_score >= threshold
+    failed = failed or not ok
+
+    print(f"  {backend:<11}: {elapsed:.2f}s | cosine min {scores.min():.5f} mean {scores.mean():.5f} "
+          f"query {query_score:.5f} (>= {threshold}) {'✅' if ok else '❌'}")
+
+if failed:
+    print("❌ ONNX backend diverges from PyTorch")
+    sys.exit(1)
+print("✅ ONNX backends match PyTorch")